@@ -0,0 +1,328 @@
+# alert_dispatch.py
+
+import argparse
+import hashlib
+import os
+import random
+import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.message import EmailMessage
+
+from db import ThreadLocalDB
+
+# --------------------------------------
+# Durable outbound alert queue
+#
+# Alerts are written to sqlite before anything is sent, so a Streamlit rerun
+# or a process restart never loses or duplicates them: each alert carries an
+# idempotency key and re-enqueueing the same key is a no-op. A background
+# AlertDispatcher claims due alerts, fans them out to a transport in
+# parallel and retries failures with exponential backoff. A claim is a lease:
+# only claims older than CLAIM_LEASE (the claiming process presumably died)
+# are handed out again, so several dispatchers can share one database.
+# --------------------------------------
+ALERT_DB = os.getenv("GUARDIAN_ALERT_DB", "alerts.db")
+CLAIM_LEASE = float(os.getenv("GUARDIAN_ALERT_LEASE", "120"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS alerts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    idempotency_key TEXT NOT NULL UNIQUE,
+    session_id TEXT NOT NULL,
+    contact_name TEXT NOT NULL,
+    contact_address TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    body TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    claimed_at REAL,
+    sent_at REAL
+);
+CREATE INDEX IF NOT EXISTS alerts_due ON alerts (status, next_attempt_at);
+CREATE INDEX IF NOT EXISTS alerts_session ON alerts (session_id, id);
+"""
+
+
+def make_idempotency_key(session_id, prompt_id, contact_name):
+    """Same session + same confirmation prompt + same contact maps to one alert."""
+    raw = "\x1f".join([session_id, prompt_id, contact_name])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class AlertQueue:
+    def __init__(self, db_path=ALERT_DB, lease=CLAIM_LEASE):
+        self.db = ThreadLocalDB(db_path, SCHEMA)
+        self.lease = lease
+        self.wakeup = threading.Event()
+        self._migrate()
+
+    def _migrate(self):
+        # Databases created before claims were leased lack claimed_at.
+        with self._conn() as conn:
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(alerts)")}
+            if "claimed_at" not in columns:
+                conn.execute("ALTER TABLE alerts ADD COLUMN claimed_at REAL")
+
+    def _conn(self):
+        return self.db.transaction()
+
+    def enqueue(self, session_id, contact_name, contact_address, subject, body, key):
+        """Queue one alert. Returns False if the idempotency key already exists."""
+        now = time.time()
+        with self._conn() as conn:
+            cursor = conn.execute(
+                """
+                INSERT OR IGNORE INTO alerts (idempotency_key, session_id, contact_name,
+                    contact_address, subject, body, next_attempt_at, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (key, session_id, contact_name, contact_address, subject, body, now, now),
+            )
+            inserted = cursor.rowcount == 1
+        if inserted:
+            self.wakeup.set()
+        return inserted
+
+    def claim_due(self, limit=32):
+        """Atomically move due alerts from 'pending' to 'sending' and stamp the claim."""
+        now = time.time()
+        with self._conn() as conn:
+            rows = conn.execute(
+                """
+                SELECT * FROM alerts WHERE status = 'pending' AND next_attempt_at <= ?
+                ORDER BY next_attempt_at LIMIT ?
+                """,
+                (now, limit),
+            ).fetchall()
+            conn.executemany(
+                "UPDATE alerts SET status = 'sending', claimed_at = ? WHERE id = ?",
+                [(now, row["id"]) for row in rows],
+            )
+        return [dict(row) for row in rows]
+
+    def mark_sent(self, alert_id):
+        with self._conn() as conn:
+            conn.execute(
+                "UPDATE alerts SET status = 'sent', sent_at = ?, attempts = attempts + 1, "
+                "last_error = NULL WHERE id = ?",
+                (time.time(), alert_id),
+            )
+
+    def mark_failed(self, alert_id, error, retry_at):
+        """Record a failed attempt; retry_at=None means give up."""
+        status = "failed" if retry_at is None else "pending"
+        with self._conn() as conn:
+            conn.execute(
+                "UPDATE alerts SET status = ?, attempts = attempts + 1, last_error = ?, "
+                "next_attempt_at = COALESCE(?, next_attempt_at) WHERE id = ?",
+                (status, str(error), retry_at, alert_id),
+            )
+
+    def requeue_expired(self):
+        """
+        Claims older than the lease were left by a crashed process and go back
+        to 'pending'; live claims of other dispatchers are left alone.
+        """
+        with self._conn() as conn:
+            cursor = conn.execute(
+                "UPDATE alerts SET status = 'pending' WHERE status = 'sending' "
+                "AND (claimed_at IS NULL OR claimed_at <= ?)",
+                (time.time() - self.lease,),
+            )
+            return cursor.rowcount
+
+    def next_due_in(self):
+        with self._conn() as conn:
+            row = conn.execute(
+                "SELECT MIN(next_attempt_at) AS due FROM alerts WHERE status = 'pending'"
+            ).fetchone()
+        if row["due"] is None:
+            return None
+        return max(0.0, row["due"] - time.time())
+
+    def alerts_for(self, session_id):
+        with self._conn() as conn:
+            rows = conn.execute(
+                "SELECT * FROM alerts WHERE session_id = ? ORDER BY id", (session_id,)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def counts(self):
+        with self._conn() as conn:
+            rows = conn.execute(
+                "SELECT status, COUNT(*) AS n FROM alerts GROUP BY status"
+            ).fetchall()
+        return {row["status"]: row["n"] for row in rows}
+
+
+# --------------------------------------
+# Transports
+# --------------------------------------
+class LogTransport:
+    """Local stub: records deliveries in memory and prints them."""
+
+    name = "log"
+
+    def __init__(self, fail_rate=0.0):
+        self.fail_rate = fail_rate
+        self.delivered = []
+        self._lock = threading.Lock()
+
+    def send(self, alert):
+        if random.random() < self.fail_rate:
+            raise ConnectionError("injected delivery failure")
+        with self._lock:
+            self.delivered.append(alert)
+        print(f"📨 Alert → {alert['contact_name']} ({alert['contact_address']})")
+
+
+class SMTPTransport:
+    """
+    Sends each alert as an e-mail. Phone numbers are mapped to
+    ``<digits>@<recipient_domain>`` (e.g. an SMS gateway). For local testing
+    point it at an SMTP sink such as ``python -m aiosmtpd -n -l 127.0.0.1:1025``.
+    """
+
+    name = "smtp"
+
+    def __init__(
+        self,
+        host="127.0.0.1",
+        port=1025,
+        sender="guardian@localhost",
+        recipient_domain="localhost",
+        timeout=10,
+    ):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.recipient_domain = recipient_domain
+        self.timeout = timeout
+
+    def recipient(self, address):
+        if "@" in address:
+            return address
+        digits = "".join(ch for ch in address if ch.isdigit())
+        return f"{digits}@{self.recipient_domain}"
+
+    def send(self, alert):
+        message = EmailMessage()
+        message["From"] = self.sender
+        message["To"] = self.recipient(alert["contact_address"])
+        message["Subject"] = alert["subject"]
+        message["X-Idempotency-Key"] = alert["idempotency_key"]
+        message.set_content(alert["body"], subtype="html")
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+            smtp.send_message(message)
+
+
+def transport_from_env():
+    kind = os.getenv("GUARDIAN_ALERT_TRANSPORT", "log")
+    if kind == "smtp":
+        return SMTPTransport(
+            host=os.getenv("GUARDIAN_SMTP_HOST", "127.0.0.1"),
+            port=int(os.getenv("GUARDIAN_SMTP_PORT", "1025")),
+            sender=os.getenv("GUARDIAN_SMTP_SENDER", "guardian@localhost"),
+            recipient_domain=os.getenv("GUARDIAN_SMTP_DOMAIN", "localhost"),
+        )
+    return LogTransport()
+
+
+# --------------------------------------
+# Dispatcher
+# --------------------------------------
+class AlertDispatcher:
+    def __init__(
+        self,
+        queue,
+        transport,
+        max_workers=8,
+        max_attempts=5,
+        base_backoff=1.0,
+        max_backoff=60.0,
+        idle_poll=5.0,
+    ):
+        self.queue = queue
+        self.transport = transport
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.idle_poll = idle_poll
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="alert-send"
+        )
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return self
+        self._thread = threading.Thread(
+            target=self._loop, name="alert-dispatcher", daemon=True
+        )
+        self._thread.start()
+        print(f"✅ Alert dispatcher started (transport: {self.transport.name}).")
+        return self
+
+    def stop(self, timeout=5.0):
+        self._stop.set()
+        self.queue.wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._pool.shutdown(wait=True)
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self.queue.wakeup.clear()
+            try:
+                self.queue.requeue_expired()
+                self.dispatch_due()
+                wait_for = self.queue.next_due_in()
+            except Exception as e:
+                print(f"❌ Alert dispatcher error: {e}")
+                wait_for = self.idle_poll
+            if wait_for is None:
+                wait_for = self.idle_poll
+            self.queue.wakeup.wait(min(wait_for, self.idle_poll))
+
+    def dispatch_due(self):
+        """Send every due alert in parallel; returns how many were claimed."""
+        alerts = self.queue.claim_due()
+        for future in [self._pool.submit(self._deliver, alert) for alert in alerts]:
+            future.result()
+        return len(alerts)
+
+    def _deliver(self, alert):
+        try:
+            self.transport.send(alert)
+        except Exception as e:
+            attempts = alert["attempts"] + 1
+            if attempts >= self.max_attempts:
+                print(f"❌ Alert to {alert['contact_name']} failed permanently: {e}")
+                self.queue.mark_failed(alert["id"], e, None)
+            else:
+                backoff = min(self.base_backoff * 2 ** (attempts - 1), self.max_backoff)
+                retry_at = time.time() + backoff * random.uniform(0.5, 1.0)
+                self.queue.mark_failed(alert["id"], e, retry_at)
+            return
+        self.queue.mark_sent(alert["id"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the GuardianAI alert dispatcher")
+    parser.add_argument("--db", default=ALERT_DB)
+    args = parser.parse_args()
+
+    dispatcher = AlertDispatcher(AlertQueue(args.db), transport_from_env()).start()
+    try:
+        while True:
+            time.sleep(60)
+            print(f"📊 Alert queue: {dispatcher.queue.counts()}")
+    except KeyboardInterrupt:
+        dispatcher.stop()
+        print("\nAlert dispatcher: Shutting down.")
@@ -3,8 +3,13 @@ import datetime
 import json
 import re
 import os
+import uuid
 from dotenv import load_dotenv
 import streamlit as st
+from llm_router import OllamaBackend, shared_router
+from llm_scheduler import CHAT, RISK, SUMMARY, LoadShedError, shared_scheduler
+from risk_trajectory import RiskTrajectory
+from verdict_cache import context_scope, shared_cache
 
 try:
     from google import genai
@@ -18,6 +23,70 @@ except ImportError:
 
 load_dotenv()
 
+# Cheap lexical pre-check for messages that may need a fast, hedged verdict.
+RISK_SUSPECT_PATTERNS = re.compile(
+    r"\b(help me|hurt(ing)?|kill|suicid\w*|die|dying|abus\w*|attack\w*|"
+    r"weapon|gun|knife|bleed\w*|can'?t breathe|please stop|scared|emergency|danger)\b",
+    re.IGNORECASE,
+)
+
+
+def is_risk_suspected(text):
+    """Return True if the text contains phrases that hint at high risk."""
+    return bool(RISK_SUSPECT_PATTERNS.search(text or ""))
+
+
+def parse_verdict(reply):
+    """Extract the last {Risk, Analysis, Action} JSON object from a reply."""
+    for json_str in reversed(re.findall(r"\{[\s\S]*?\}", reply or "")):
+        try:
+            parsed = json.loads(json_str)
+        except json.JSONDecodeError:
+            continue
+        if isinstance(parsed, dict) and "Risk" in parsed:
+            return parsed
+    return {}
+
+
+# --------------------------------------
+# LLM backends (see llm_router.LLMRouter)
+# --------------------------------------
+class GoogleGenAIBackend:
+    def __init__(self, api_key, model):
+        self.name = f"google@{model}"
+        self.client = genai.Client(api_key=api_key)
+        self.model = model
+
+    def call(self, messages, cancel_event):
+        contents = [
+            types.Content(
+                role="user",
+                parts=[
+                    types.Part.from_text(
+                        text="\n".join([f"{m['role']}: {m['content']}" for m in messages])
+                    )
+                ],
+            )
+        ]
+        config = types.GenerateContentConfig()
+        response_text = ""
+        for chunk in self.client.models.generate_content_stream(
+            model=self.model, contents=contents, config=config
+        ):
+            if cancel_event.is_set():
+                break
+            if chunk.text:
+                response_text += chunk.text
+        return response_text.strip()
+
+
+def _google_api_key():
+    # Access the Google API key from Streamlit secrets
+    try:
+        return st.secrets["api_keys"]["GOOGLE_API_KEY"]
+    except Exception:
+        return os.getenv("GOOGLE_API_KEY")
+
 
 class ConversationMemory:
     def __init__(self, summarizer, max_buffer_turns=6):
@@ -39,7 +108,14 @@ class ConversationMemory:
             f"Summarize the following conversation briefly but meaningfully. "
             f"Keep emotional tone/context. Previous summary: '{self.summary}'\n\nConversation:\n{convo_text}"
         )
-        new_summary, _ = self.summarizer(summarization_prompt, summarize_mode=True)
+        try:
+            new_summary, _ = self.summarizer(summarization_prompt, summarize_mode=True)
+        except LoadShedError as e:
+            # Backend is saturated: keep the buffer and retry on the next turn,
+            # dropping the oldest turns if deferral goes on for too long.
+            print(f"⚠️ Summarization deferred: {e}")
+            self.buffer = self.buffer[-3 * self.max_buffer :]
+            return
         self.summary = new_summary.strip()
         self.buffer = []
 
@@ -76,10 +152,28 @@ class GuardianAI:
     """
 
     def __init__(
-        self, model="gemma3n:e2b", host="http://127.0.0.1:11502", mode="Truly local"
+        self,
+        model="gemma3n:e2b",
+        host="http://127.0.0.1:11502",
+        mode="Truly local",
+        fallback_hosts=None,
+        remote_fallback=None,
+        verdict_cache=None,
+        scheduler=None,
+        session_id=None,
     ):
         print(f"GuardianAI initializing in mode: {mode}")
         self.mode = mode
+        self.session_id = session_id or uuid.uuid4().hex
+
+        if fallback_hosts is None:
+            fallback_hosts = [
+                h.strip()
+                for h in os.getenv("GUARDIAN_FALLBACK_HOSTS", "").split(",")
+                if h.strip()
+            ]
+        if remote_fallback is None:
+            remote_fallback = os.getenv("GUARDIAN_REMOTE_FALLBACK", "0") == "1"
 
         if mode == "Demo":
             if not GOOGLE_GENAI_AVAILABLE:
@@ -87,26 +181,37 @@ class GuardianAI:
                     "❌ Google GenAI library not available for Demo mode. Install it with `pip install google-generativeai`."
                 )
 
-            # Access the Google API key from Streamlit secrets
-            api_key = st.secrets["api_keys"]["GOOGLE_API_KEY"]
+            api_key = _google_api_key()
             if not api_key:
                 raise RuntimeError(
                     "❌ GOOGLE_API_KEY not set in Streamlit secrets. Cannot initialize Demo mode."
                 )
 
-            self.genai_client = genai.Client(api_key=api_key)
             self.model = "gemma-3n-e2b-it"
+            self.router = shared_router([GoogleGenAIBackend(api_key, self.model)])
+            self.genai_client = self.router.backends[0].client
             self.client = None
             self.use_google_api = True
             print("✅ Demo mode: Google GenAI client initialized.")
         else:
-            self.client = ollama.Client(host=host)
             self.model = model
+            backends = [OllamaBackend(h, model) for h in [host] + list(fallback_hosts)]
+            if remote_fallback and GOOGLE_GENAI_AVAILABLE and _google_api_key():
+                backends.append(GoogleGenAIBackend(_google_api_key(), "gemma-3n-e2b-it"))
+            self.router = shared_router(backends)
+            self.client = ollama.Client(host=host)
             self.use_google_api = False
             print("✅ Truly local mode: Ollama client initialized.")
 
+        self.scheduler = scheduler or shared_scheduler()
+        print(f"✅ LLM router backends: {[b.name for b in self.router.backends]}")
+
         self.memory_log = []
         self.memory = ConversationMemory(summarizer=self.chat)
+        self.trajectory = RiskTrajectory()
+        if verdict_cache is None and os.getenv("GUARDIAN_VERDICT_CACHE", "1") == "1":
+            verdict_cache = shared_cache()
+        self.verdict_cache = verdict_cache
 
     def log(self, role, content):
         entry = {
@@ -117,46 +222,60 @@ class GuardianAI:
         self.memory_log.append(entry)
         self.memory.add_turn(role, content)
 
-    def _make_llm_call(self, messages):
-        if self.use_google_api:
-            contents = [
-                types.Content(
-                    role="user",
-                    parts=[
-                        types.Part.from_text(
-                            text="\n".join(
-                                [f"{m['role']}: {m['content']}" for m in messages]
-                            )
-                        )
-                    ],
-                )
-            ]
-            config = types.GenerateContentConfig()
-            response_text = ""
-            for chunk in self.genai_client.models.generate_content_stream(
-                model=self.model, contents=contents, config=config
-            ):
-                if chunk.text:
-                    response_text += chunk.text
-            return response_text.strip()
-        else:
-            response = self.client.chat(model=self.model, messages=messages)
-            return response["message"]["content"].strip()
+    def _make_llm_call(self, messages, hedge=False, priority=CHAT):
+        return self.scheduler.run(self.router.call, messages, hedge=hedge, priority=priority)
+
+    def _cache_scope(self):
+        # Verdicts are reused within a session while its stable context holds:
+        # same summary and same coarse trajectory. The raw turn buffer and the
+        # turn counter change every turn and would make every lookup a miss.
+        state = self.trajectory.state()
+        return context_scope(
+            self.session_id,
+            self.mode,
+            self.model,
+            self.memory.summary,
+            state["trend"],
+            state["escalating"],
+        )
 
     def chat(self, user_input, summarize_mode=False):
         if summarize_mode:
             messages = [{"role": "user", "content": user_input}]
         else:
             context = self.memory.get_context_messages()
+            trajectory = self.trajectory.as_prompt_feature()
+            if trajectory:
+                context = [{"role": "system", "content": trajectory}] + context
             messages = (
                 [{"role": "system", "content": self.SYSTEM_PROMPT}]
                 + context
                 + [{"role": "user", "content": user_input}]
             )
 
-        reply = self._make_llm_call(messages)
+        hedge = not summarize_mode and is_risk_suspected(user_input)
+        use_cache = not summarize_mode and self.verdict_cache is not None
+        reply = None
+        if use_cache:
+            scope = self._cache_scope()
+            if hedge:
+                # Possibly high risk: always get a fresh verdict.
+                self.verdict_cache.record_bypass()
+            else:
+                reply = self.verdict_cache.get(user_input, scope)
+
+        if reply is None:
+            priority = SUMMARY if summarize_mode else RISK if hedge else CHAT
+            reply = self._make_llm_call(messages, hedge=hedge, priority=priority)
+            if use_cache and not hedge:
+                self.verdict_cache.put(
+                    user_input, scope, reply, parse_verdict(reply).get("Risk", "")
+                )
 
         if not summarize_mode:
+            verdict = parse_verdict(reply)
+            if verdict:
+                self.trajectory.update(verdict)
             self.log("guardian", reply)
         return reply, ""
 
@@ -2,11 +2,22 @@ import torch
 import librosa
 from transformers import WhisperProcessor, WhisperForConditionalGeneration
 import os
+from model_snapshot import load_model
 
-# Load model and processor
+# Load model and processor (mmap'ed half-precision snapshot when prepared)
 model_path = os.path.join(os.path.dirname(__file__), "audio_models")
 processor = WhisperProcessor.from_pretrained(model_path, use_fast=False)
-model = WhisperForConditionalGeneration.from_pretrained(model_path)
+model = load_model(model_path, WhisperForConditionalGeneration)
+
+
+def transcribe_waveform(waveform, sampling_rate=16000):
+    """Transcribe a mono float waveform (already at 16 kHz)"""
+    inputs = processor(audio=waveform, sampling_rate=sampling_rate, return_tensors="pt")
+    with torch.no_grad():
+        generated_ids = model.generate(inputs["input_features"].to(model.dtype))
+        caption = processor.batch_decode(generated_ids, skip_special_tokens=True)[0]
+
+    return caption
 
 
 # Example usage function
@@ -15,12 +26,7 @@ def process_audio_file(audio_path):
     waveform, sr = librosa.load(audio_path, sr=16000, mono=True)
 
     # Generate caption
-    inputs = processor(audio=waveform, sampling_rate=16000, return_tensors="pt")
-    with torch.no_grad():
-        generated_ids = model.generate(inputs["input_features"])
-        caption = processor.batch_decode(generated_ids, skip_special_tokens=True)[0]
-
-    return caption
+    return transcribe_waveform(waveform)
 
 
 # Example usage (only runs if this file is executed directly)
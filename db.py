@@ -0,0 +1,47 @@
+# db.py
+
+import sqlite3
+import threading
+
+# --------------------------------------
+# Shared sqlite helpers (WAL mode, one connection per thread)
+# --------------------------------------
+
+
+class ThreadLocalDB:
+    def __init__(self, db_path, schema=None):
+        self.db_path = db_path
+        self._local = threading.local()
+        if schema:
+            self.connection().executescript(schema)
+
+    def connection(self):
+        # sqlite connections must not be shared across threads.
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def transaction(self, mode="IMMEDIATE"):
+        """IMMEDIATE takes the write lock up front; use DEFERRED for reads."""
+        return _Transaction(self.connection(), mode)
+
+
+class _Transaction:
+    """Wrap a connection in BEGIN <mode> ... COMMIT/ROLLBACK."""
+
+    def __init__(self, conn, mode="IMMEDIATE"):
+        self.conn = conn
+        self.mode = mode
+
+    def __enter__(self):
+        self.conn.execute(f"BEGIN {self.mode}")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
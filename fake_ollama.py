@@ -0,0 +1,161 @@
+# fake_ollama.py
+
+import argparse
+import datetime
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# --------------------------------------
+# Minimal stand-in for the Ollama /api/chat endpoint.
+# Used to exercise LLMRouter fallback/hedging without a real model:
+#   python fake_ollama.py --port 11503 --latency 0.2
+#   python fake_ollama.py --port 11504 --latency 3 --fail-rate 0.3
+#   python fake_ollama.py --latency lognormal:0.8:0.5
+#
+# Latency specs: "<seconds>", "uniform:<lo>:<hi>", "normal:<mean>:<std>",
+# "lognormal:<median>:<sigma>".
+# --------------------------------------
+DEFAULT_REPLY = {"Risk": "Low", "Analysis": "All clear", "Action": "No concern"}
+SUMMARY_PREFIX = "Summarize the following conversation"
+
+
+def parse_latency(spec):
+    """Turn a latency spec (or number) into a zero-arg sampler in seconds."""
+    if callable(spec):
+        return spec
+    if isinstance(spec, (int, float)):
+        return lambda: float(spec)
+    kind, _, params = str(spec).partition(":")
+    if not params:
+        return lambda: float(kind)
+    values = [float(v) for v in params.split(":")]
+    if kind == "uniform":
+        return lambda: random.uniform(values[0], values[1])
+    if kind == "normal":
+        return lambda: max(0.0, random.gauss(values[0], values[1]))
+    if kind == "lognormal":
+        mu = math.log(values[0])
+        return lambda: random.lognormvariate(mu, values[1])
+    raise ValueError(f"Unknown latency spec: {spec}")
+
+
+class ServerStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.summaries = 0
+        self.failures = 0
+        self.total_latency = 0.0
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "requests": self.requests,
+                "summaries": self.summaries,
+                "failures": self.failures,
+                "mean_injected_latency": (
+                    self.total_latency / self.requests if self.requests else 0.0
+                ),
+            }
+
+
+def make_handler(latency=0.0, fail_rate=0.0, reply=None, stats=None):
+    reply_text = json.dumps(reply or DEFAULT_REPLY)
+    sample_latency = parse_latency(latency)
+    stats = stats or ServerStats()
+
+    class FakeOllamaHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain")
+            self.end_headers()
+            self.wfile.write(b"Ollama is running")
+
+        def do_POST(self):
+            if self.path != "/api/chat":
+                self.send_error(404)
+                return
+
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            delay = sample_latency()
+            messages = request.get("messages") or [{}]
+            is_summary = messages[-1].get("content", "").startswith(SUMMARY_PREFIX)
+            failed = random.random() < fail_rate
+            with stats.lock:
+                stats.requests += 1
+                stats.summaries += is_summary
+                stats.failures += failed
+                stats.total_latency += delay
+            time.sleep(delay)
+
+            if failed:
+                self.send_error(500, "injected failure")
+                return
+
+            model = request.get("model", "fake")
+            created_at = datetime.datetime.now().isoformat()
+
+            def message(content, done):
+                return {
+                    "model": model,
+                    "created_at": created_at,
+                    "message": {"role": "assistant", "content": content},
+                    "done": done,
+                }
+
+            try:
+                if request.get("stream", True):
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/x-ndjson")
+                    self.end_headers()
+                    for i in range(0, len(reply_text), 16):
+                        chunk = message(reply_text[i : i + 16], False)
+                        self.wfile.write((json.dumps(chunk) + "\n").encode())
+                        self.wfile.flush()
+                    self.wfile.write((json.dumps(message("", True)) + "\n").encode())
+                else:
+                    body = json.dumps(message(reply_text, True)).encode()
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+            except (BrokenPipeError, ConnectionResetError):
+                # Client cancelled (e.g. the losing side of a hedged request).
+                pass
+
+    return FakeOllamaHandler
+
+
+def serve(host="127.0.0.1", port=11503, latency=0.0, fail_rate=0.0, reply=None):
+    stats = ServerStats()
+    server = ThreadingHTTPServer(
+        (host, port), make_handler(latency, fail_rate, reply, stats)
+    )
+    server.daemon_threads = True
+    server.stats = stats
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake Ollama chat server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11503)
+    parser.add_argument("--latency", default="0", help="seconds or distribution spec")
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = serve(args.host, args.port, args.latency, args.fail_rate)
+    print(f"🧪 Fake Ollama listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nShutting down.")
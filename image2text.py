@@ -4,6 +4,7 @@ import torch
 from PIL import Image
 from transformers import BlipProcessor, BlipForConditionalGeneration
 import os
+from model_snapshot import load_model
 
 # --------------------------------------
 # Local Model Path (no internet, no Hugging Face hub)
@@ -17,8 +18,8 @@ def load_blip_local():
         processor = BlipProcessor.from_pretrained(
             MODEL_DIR, local_files_only=True, use_fast=False
         )
-        model = BlipForConditionalGeneration.from_pretrained(
-            MODEL_DIR, local_files_only=True
+        model = load_model(
+            MODEL_DIR, BlipForConditionalGeneration, local_files_only=True
         ).to(device)
         return processor, model
     except Exception as e:
@@ -42,6 +43,7 @@ def describe_image(image_path, security_mode=True):
     try:
         image = Image.open(image_path).convert("RGB")
         inputs = processor(images=image, return_tensors="pt").to(device)
+        inputs["pixel_values"] = inputs["pixel_values"].to(model.dtype)
 
         output = model.generate(**inputs, max_length=50)
         raw_caption = processor.decode(output[0], skip_special_tokens=True).strip()
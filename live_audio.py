@@ -0,0 +1,375 @@
+# live_audio.py
+
+import argparse
+import asyncio
+import functools
+import json
+import queue
+import socketserver
+import threading
+import time
+
+import numpy as np
+
+# --------------------------------------
+# Continuous live-audio monitoring
+#
+# Input is raw PCM: 16-bit little-endian, mono, 16 kHz. Samples go into a
+# fixed-size ring buffer; an energy VAD cuts speech into segments (long
+# speech is cut every `max_segment` seconds), and each segment is
+# transcribed exactly once on a worker thread. Only the new text is handed to
+# `on_segment`, so memory stays bounded however long the stream runs.
+#
+#   python live_audio.py --port 8700          # raw TCP feed, verdicts sent back
+#   ffmpeg -i mic.wav -f s16le -ac 1 -ar 16000 - | nc 127.0.0.1 8700
+#
+# The analysis service also accepts a chunked HTTP feed on
+# POST /stream/audio?session_id=... (see handle_http_stream).
+# --------------------------------------
+SAMPLE_RATE = 16000
+FRAME_MS = 30
+
+
+class PCMRingBuffer:
+    """Fixed-capacity float32 ring addressed by absolute sample index."""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.data = np.zeros(capacity, dtype=np.float32)
+        self.total = 0
+
+    def write(self, samples):
+        n = len(samples)
+        if n > self.capacity:
+            self.total += n - self.capacity
+            samples = samples[-self.capacity :]
+            n = self.capacity
+        start = self.total % self.capacity
+        end = start + n
+        if end <= self.capacity:
+            self.data[start:end] = samples
+        else:
+            split = self.capacity - start
+            self.data[start:] = samples[:split]
+            self.data[: n - split] = samples[split:]
+        self.total += n
+
+    def read(self, start, end):
+        """Copy samples [start, end); anything already overwritten is skipped."""
+        start = max(start, self.total - self.capacity, 0)
+        end = min(end, self.total)
+        if end <= start:
+            return np.zeros(0, dtype=np.float32)
+        s = start % self.capacity
+        e = s + (end - start)
+        if e <= self.capacity:
+            return self.data[s:e].copy()
+        return np.concatenate((self.data[s:], self.data[: e - self.capacity]))
+
+
+class EnergyVAD:
+    """RMS voice activity detector with an adaptive noise floor."""
+
+    def __init__(self, min_rms=0.01, ratio=3.0, alpha=0.05):
+        self.min_rms = min_rms
+        self.ratio = ratio
+        self.alpha = alpha
+        self.noise = min_rms / ratio
+
+    def is_speech(self, frame):
+        rms = float(np.sqrt(np.mean(frame * frame))) if len(frame) else 0.0
+        speech = rms > max(self.min_rms, self.noise * self.ratio)
+        if not speech:
+            self.noise = self.alpha * rms + (1 - self.alpha) * self.noise
+        return speech
+
+
+class LiveAudioMonitor:
+    def __init__(
+        self,
+        on_segment,
+        transcribe=None,
+        sample_rate=SAMPLE_RATE,
+        buffer_seconds=30.0,
+        max_segment=10.0,
+        min_segment=0.5,
+        silence=0.6,
+        preroll=0.2,
+        max_queued_segments=4,
+    ):
+        if transcribe is None:
+            # Imported lazily so the module can be used without loading Whisper.
+            from audio2text import transcribe_waveform as transcribe
+        self.on_segment = on_segment
+        self.transcribe = transcribe
+        self.sample_rate = sample_rate
+        self.frame_len = sample_rate * FRAME_MS // 1000
+        self.max_segment = int(max_segment * sample_rate)
+        self.min_segment = int(min_segment * sample_rate)
+        self.hangover = int(silence * sample_rate)
+        self.preroll = int(preroll * sample_rate)
+        self.ring = PCMRingBuffer(int(buffer_seconds * sample_rate))
+        if self.ring.capacity < self.max_segment + self.preroll:
+            raise ValueError("buffer_seconds must exceed max_segment + preroll")
+        self.vad = EnergyVAD()
+
+        self._carry_bytes = b""
+        self._frame_start = 0  # absolute index of the next unclassified frame
+        self._committed = 0  # everything before this has been transcribed/skipped
+        self._segment_start = None
+        self._silence_run = 0
+        self._voiced = 0  # speech samples in the current segment
+        # Bounded: a slow transcriber blocks feed(), which backpressures the source.
+        self._segments = queue.Queue(maxsize=max_queued_segments)
+        self._worker = threading.Thread(
+            target=self._transcribe_loop, name="live-audio-transcriber", daemon=True
+        )
+        self._worker.start()
+        self.stats = {"seconds": 0.0, "speech_seconds": 0.0, "segments": 0, "errors": 0}
+
+    # ---------- ingest ----------
+    def feed(self, pcm_bytes):
+        data = self._carry_bytes + pcm_bytes
+        usable = len(data) - len(data) % 2
+        self._carry_bytes = data[usable:]
+        if not usable:
+            return
+        samples = np.frombuffer(data[:usable], dtype="<i2").astype(np.float32) / 32768.0
+        self.ring.write(samples)
+        self.stats["seconds"] += len(samples) / self.sample_rate
+
+        while self.ring.total - self._frame_start >= self.frame_len:
+            start = self._frame_start
+            end = start + self.frame_len
+            self._classify(self.ring.read(start, end), start, end)
+            self._frame_start = end
+
+    def _classify(self, frame, start, end):
+        speech = self.vad.is_speech(frame)
+        if speech:
+            self.stats["speech_seconds"] += len(frame) / self.sample_rate
+
+        if self._segment_start is None:
+            if speech:
+                self._segment_start = max(start - self.preroll, self._committed)
+                self._silence_run = 0
+                self._voiced = end - start
+            else:
+                self._committed = max(self._committed, end - self.preroll)
+            return
+
+        if speech:
+            self._voiced += end - start
+        self._silence_run = 0 if speech else self._silence_run + (end - start)
+        if self._silence_run >= self.hangover:
+            self._emit(self._segment_start, end)
+            self._segment_start = None
+        elif end - self._segment_start >= self.max_segment:
+            # Sliding window for long speech: cut here, continue from the cut.
+            self._emit(self._segment_start, end)
+            self._segment_start = end
+
+    def _emit(self, start, end):
+        # Judge by voiced time, not span: preroll and hangover pad even a
+        # single click past min_segment.
+        voiced, self._voiced = self._voiced, 0
+        if voiced >= self.min_segment:
+            audio = self.ring.read(start, end)
+            self._segments.put((audio, start / self.sample_rate, end / self.sample_rate))
+        self._committed = end
+
+    def close(self):
+        """Flush any in-progress speech and wait for pending transcriptions."""
+        if self._segment_start is not None:
+            self._emit(self._segment_start, self.ring.total)
+            self._segment_start = None
+        self._segments.put(None)
+        self._worker.join()
+
+    # ---------- transcription ----------
+    def _transcribe_loop(self):
+        while True:
+            item = self._segments.get()
+            if item is None:
+                return
+            audio, start, end = item
+            try:
+                text = self.transcribe(audio).strip()
+            except Exception as e:
+                self.stats["errors"] += 1
+                print(f"❌ Live transcription failed: {e}")
+                continue
+            if text:
+                self.stats["segments"] += 1
+                try:
+                    self.on_segment(text, start, end)
+                except Exception as e:
+                    self.stats["errors"] += 1
+                    print(f"❌ Live segment handler failed: {e}")
+
+
+def _local_turn(guardian, message):
+    guardian.log("user", message)
+    reply, _ = guardian.chat(message)
+    return reply
+
+
+def guardian_segment_handler(guardian, emit, turn=None):
+    """
+    on_segment callback that runs a GuardianAI turn and emits the verdict.
+    ``turn(message) -> reply`` overrides how the turn is run (default: inline).
+    """
+    from app_agent import parse_verdict
+
+    if turn is None:
+        turn = functools.partial(_local_turn, guardian)
+
+    def on_segment(text, start, end):
+        message = f"[Live Audio] {text}"
+        reply = turn(message)
+        emit(
+            {
+                "event": "segment",
+                "start": round(start, 2),
+                "end": round(end, 2),
+                "text": text,
+                "reply": reply,
+                "verdict": parse_verdict(reply),
+                "trajectory": guardian.trajectory.state(),
+            }
+        )
+
+    return on_segment
+
+
+# --------------------------------------
+# Chunked HTTP feed (registered on the analysis service)
+# --------------------------------------
+def _load_transcriber():
+    from audio2text import transcribe_waveform
+
+    return transcribe_waveform
+
+
+async def handle_http_stream(service, reader, writer, query, headers):
+    from service import _guardian_turn, read_chunks, send_stream
+
+    session_id = query.get("session_id", "default")
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+
+    def emit(event):
+        loop.call_soon_threadsafe(events.put_nowait, event)
+
+    service._admit()
+    try:
+        session = await service.get_session(session_id)
+        async with service._slots:
+            transcribe_waveform = await service._run_blocking(_load_transcriber)
+
+        # Model work is submitted back to the event loop from the monitor's
+        # worker thread, so each transcription and each turn takes a service
+        # slot and runs on the service executor like any other request. The
+        # session is locked per turn only, so other requests for it interleave.
+        async def transcribe_async(audio):
+            async with service._slots:
+                return await service._run_blocking(transcribe_waveform, audio)
+
+        async def turn_async(message):
+            async with session.lock, service._slots:
+                session.last_used = time.monotonic()
+                return await service._run_blocking(
+                    _guardian_turn, session.guardian, message
+                )
+
+        def in_loop(coroutine_fn):
+            return lambda arg: asyncio.run_coroutine_threadsafe(coroutine_fn(arg), loop).result()
+
+        monitor = LiveAudioMonitor(
+            guardian_segment_handler(session.guardian, emit, turn=in_loop(turn_async)),
+            transcribe=in_loop(transcribe_async),
+        )
+
+        async def pump():
+            # feed() is cheap framing/VAD, but blocks while transcriptions are
+            # backed up; keep it off the service executor so it cannot starve
+            # the model work it is waiting for.
+            try:
+                async for chunk in read_chunks(reader, headers):
+                    await loop.run_in_executor(None, monitor.feed, chunk)
+            except Exception as e:
+                emit({"event": "error", "error": str(e)})
+            finally:
+                await loop.run_in_executor(None, monitor.close)
+                emit({"event": "end", "stats": monitor.stats})
+                emit(None)
+
+        async def drain():
+            yield {"event": "accepted", "session_id": session_id}
+            while True:
+                event = await events.get()
+                if event is None:
+                    return
+                yield event
+
+        feeder = asyncio.create_task(pump())
+        await send_stream(writer, drain())
+        await feeder
+    finally:
+        service.pending -= 1
+
+
+# --------------------------------------
+# Raw TCP feed
+# --------------------------------------
+def make_tcp_handler(guardian_factory):
+    class LiveAudioHandler(socketserver.StreamRequestHandler):
+        def handle(self):
+            lock = threading.Lock()
+
+            def emit(event):
+                with lock:
+                    self.wfile.write((json.dumps(event) + "\n").encode())
+                    self.wfile.flush()
+
+            guardian = guardian_factory()
+            monitor = LiveAudioMonitor(guardian_segment_handler(guardian, emit))
+            print(f"🎙️ Live audio stream from {self.client_address[0]}")
+            try:
+                while True:
+                    chunk = self.request.recv(64 * 1024)
+                    if not chunk:
+                        break
+                    monitor.feed(chunk)
+            except ConnectionError:
+                pass
+            finally:
+                monitor.close()
+                try:
+                    emit({"event": "end", "stats": monitor.stats})
+                except OSError:
+                    pass
+
+    return LiveAudioHandler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="GuardianAI live audio monitor")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8700)
+    parser.add_argument("--ollama-host", default="http://127.0.0.1:11502")
+    parser.add_argument("--model", default="gemma3n:e2b")
+    args = parser.parse_args()
+
+    from app_agent import GuardianAI
+
+    def factory():
+        return GuardianAI(model=args.model, host=args.ollama_host, mode="Local")
+
+    server = socketserver.ThreadingTCPServer((args.host, args.port), make_tcp_handler(factory))
+    server.daemon_threads = True
+    print(f"🎙️ Live audio monitor listening on tcp://{args.host}:{args.port} (s16le mono 16 kHz)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nLive audio monitor: Shutting down.")
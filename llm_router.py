@@ -0,0 +1,340 @@
+# llm_router.py
+
+import http.client
+import json
+import os
+import socket
+import threading
+import time
+import urllib.parse
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+class BackendUnavailable(RuntimeError):
+    """Raised when every LLM backend failed for a request."""
+
+
+class CancelEvent(threading.Event):
+    """
+    Event passed to ``backend.call``. Besides polling ``is_set()`` between
+    chunks, a backend can register ``on_set(callback)`` to abort a call that
+    is blocked before the first chunk (e.g. by shutting down its socket).
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._callbacks = []
+        self._callback_lock = threading.Lock()
+
+    def on_set(self, callback):
+        with self._callback_lock:
+            if not self.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def set(self):
+        with self._callback_lock:
+            super().set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"⚠️ LLM cancel callback failed: {e}")
+
+
+# --------------------------------------
+# Per-backend health statistics
+# --------------------------------------
+class BackendStats:
+    def __init__(self, alpha=0.3, window=50):
+        self.alpha = alpha
+        self.ewma_latency = None
+        self.ewma_error = 0.0
+        self.latencies = deque(maxlen=window)
+        self.consecutive_failures = 0
+        self.down_until = 0.0
+        self.calls = 0
+        self.failures = 0
+
+    def record_success(self, latency):
+        self.calls += 1
+        self.latencies.append(latency)
+        if self.ewma_latency is None:
+            self.ewma_latency = latency
+        else:
+            self.ewma_latency = self.alpha * latency + (1 - self.alpha) * self.ewma_latency
+        self.ewma_error = (1 - self.alpha) * self.ewma_error
+        self.consecutive_failures = 0
+        self.down_until = 0.0
+
+    def record_censored(self, elapsed):
+        # A cancelled hedge loser took at least `elapsed`; count it as a sample
+        # so a backend that keeps losing drifts down the ranking.
+        self.latencies.append(elapsed)
+        if self.ewma_latency is None:
+            self.ewma_latency = elapsed
+        elif elapsed > self.ewma_latency:
+            self.ewma_latency = self.alpha * elapsed + (1 - self.alpha) * self.ewma_latency
+
+    def record_failure(self, error_threshold, base_cooldown, max_cooldown):
+        self.calls += 1
+        self.failures += 1
+        self.ewma_error = self.alpha + (1 - self.alpha) * self.ewma_error
+        self.consecutive_failures += 1
+        if self.ewma_error >= error_threshold:
+            cooldown = min(
+                base_cooldown * (2 ** (self.consecutive_failures - 1)), max_cooldown
+            )
+            self.down_until = time.monotonic() + cooldown
+
+    def healthy(self):
+        return time.monotonic() >= self.down_until
+
+    def p95(self):
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+    def snapshot(self):
+        return {
+            "ewma_latency": self.ewma_latency,
+            "ewma_error": round(self.ewma_error, 3),
+            "p95": self.p95(),
+            "healthy": self.healthy(),
+            "calls": self.calls,
+            "failures": self.failures,
+        }
+
+
+# --------------------------------------
+# Router
+# --------------------------------------
+class LLMRouter:
+    """
+    Routes chat requests across several LLM backends.
+
+    A backend is any object with a ``name`` attribute and a
+    ``call(messages, cancel_event)`` method returning the reply text. The
+    router sends each request to the healthy backend with the lowest latency
+    EWMA and falls back to the next one on error. With ``hedge=True`` a second
+    request is fired at the runner-up once the primary exceeds its p95
+    latency; whichever answers first wins and the other is cancelled.
+    """
+
+    def __init__(
+        self,
+        backends,
+        alpha=0.3,
+        error_threshold=0.5,
+        base_cooldown=5.0,
+        max_cooldown=60.0,
+        default_hedge_delay=2.0,
+        min_hedge_samples=5,
+    ):
+        if not backends:
+            raise ValueError("LLMRouter needs at least one backend.")
+        self.backends = list(backends)
+        self.stats = {b.name: BackendStats(alpha=alpha) for b in self.backends}
+        self.error_threshold = error_threshold
+        self.base_cooldown = base_cooldown
+        self.max_cooldown = max_cooldown
+        self.default_hedge_delay = default_hedge_delay
+        self.min_hedge_samples = min_hedge_samples
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=4 * len(self.backends), thread_name_prefix="llm-router"
+        )
+
+    def ranked(self):
+        """Backends ordered best-first: healthy by latency EWMA, then the rest."""
+        with self._lock:
+
+            def key(backend):
+                stats = self.stats[backend.name]
+                # Unmeasured backends sort first so they get probed, unless all
+                # they have done so far is fail.
+                latency = stats.ewma_latency
+                if latency is None:
+                    latency = float("inf") if stats.failures else 0.0
+                return (not stats.healthy(), latency * (1 + stats.ewma_error))
+
+            return sorted(self.backends, key=key)
+
+    def hedge_delay(self, backend):
+        stats = self.stats[backend.name]
+        with self._lock:
+            if len(stats.latencies) < self.min_hedge_samples:
+                return self.default_hedge_delay
+            return stats.p95()
+
+    def _run(self, backend, messages, cancel_event):
+        start = time.monotonic()
+        try:
+            reply = backend.call(messages, cancel_event)
+        except Exception:
+            if not cancel_event.is_set():
+                with self._lock:
+                    self.stats[backend.name].record_failure(
+                        self.error_threshold, self.base_cooldown, self.max_cooldown
+                    )
+            raise
+        if not cancel_event.is_set():
+            with self._lock:
+                self.stats[backend.name].record_success(time.monotonic() - start)
+        return reply
+
+    def call(self, messages, hedge=False):
+        order = self.ranked()
+        in_flight = {}
+        errors = []
+
+        def launch(backend):
+            cancel_event = CancelEvent()
+            future = self._executor.submit(self._run, backend, messages, cancel_event)
+            in_flight[future] = (backend, cancel_event, time.monotonic())
+
+        launch(order.pop(0))
+        hedge_at = None
+        if hedge and order:
+            primary = next(iter(in_flight.values()))[0]
+            hedge_at = time.monotonic() + self.hedge_delay(primary)
+
+        while in_flight:
+            timeout = None
+            if hedge_at is not None:
+                timeout = max(0.0, hedge_at - time.monotonic())
+            done, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+
+            if not done:
+                # Primary is past its p95 deadline: hedge to the runner-up.
+                hedge_at = None
+                if order:
+                    launch(order.pop(0))
+                continue
+
+            for future in done:
+                backend, _, _ = in_flight.pop(future)
+                try:
+                    reply = future.result()
+                except Exception as e:
+                    print(f"⚠️ LLM backend {backend.name} failed: {e}")
+                    errors.append(f"{backend.name}: {e}")
+                    if not in_flight and order:
+                        # A fallback, not a hedge: no second request for it.
+                        hedge_at = None
+                        launch(order.pop(0))
+                    continue
+
+                now = time.monotonic()
+                for loser, (loser_backend, cancel_event, started) in in_flight.items():
+                    cancel_event.set()
+                    loser.cancel()
+                    with self._lock:
+                        self.stats[loser_backend.name].record_censored(now - started)
+                return reply
+
+        raise BackendUnavailable("All LLM backends failed: " + "; ".join(errors))
+
+    def status(self):
+        with self._lock:
+            return {name: stats.snapshot() for name, stats in self.stats.items()}
+
+
+# --------------------------------------
+# Ollama backend
+# --------------------------------------
+class OllamaBackend:
+    """
+    Streams Ollama's /api/chat over a dedicated connection per call, so a
+    cancel can shut the socket down: a hedge loser still waiting on prompt
+    evaluation releases its thread and its Ollama request at once.
+    """
+
+    def __init__(self, host, model, timeout=None):
+        if timeout is None:
+            timeout = float(os.getenv("GUARDIAN_LLM_TIMEOUT", "60"))
+        self.name = f"ollama@{host}"
+        self.host = host
+        self.model = model
+        # Bounded connect/read timeouts: a hung Ollama must fail over, not block forever.
+        self.timeout = timeout
+        url = urllib.parse.urlsplit(host if "://" in host else f"http://{host}")
+        self._https = url.scheme == "https"
+        self._netloc = url.netloc
+        self._path = url.path.rstrip("/") + "/api/chat"
+
+    def _connect(self):
+        if self._https:
+            return http.client.HTTPSConnection(self._netloc, timeout=self.timeout)
+        return http.client.HTTPConnection(self._netloc, timeout=self.timeout)
+
+    def call(self, messages, cancel_event):
+        conn = self._connect()
+        try:
+            conn.connect()
+            cancel_event.on_set(lambda: _shutdown(conn))
+            body = json.dumps({"model": self.model, "messages": messages, "stream": True})
+            conn.request(
+                "POST", self._path, body=body, headers={"Content-Type": "application/json"}
+            )
+            response = conn.getresponse()
+            if response.status != 200:
+                raise RuntimeError(
+                    f"Ollama returned {response.status}: {response.read(200)!r}"
+                )
+            reply = ""
+            for line in response:
+                if cancel_event.is_set():
+                    break
+                if not line.strip():
+                    continue
+                chunk = json.loads(line)
+                if chunk.get("error"):
+                    raise RuntimeError(chunk["error"])
+                reply += chunk.get("message", {}).get("content", "")
+                if chunk.get("done"):
+                    break
+            return reply.strip()
+        finally:
+            conn.close()
+
+
+def _shutdown(conn):
+    # shutdown() (unlike close()) wakes a thread blocked in recv() on Linux.
+    sock = conn.sock
+    if sock is not None:
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+
+_shared_routers = {}
+_shared_lock = threading.Lock()
+
+
+def shared_router(backends, **kwargs):
+    """
+    Process-wide router per backend set, so health stats, cooldowns and the
+    thread pool are shared by every session instead of relearned per session.
+    """
+    key = tuple((b.name, getattr(b, "model", None)) for b in backends)
+    with _shared_lock:
+        router = _shared_routers.get(key)
+        if router is None:
+            router = _shared_routers[key] = LLMRouter(backends, **kwargs)
+        return router
+
+
+def shared_router_status():
+    """Backend status across every shared router in this process."""
+    with _shared_lock:
+        routers = list(_shared_routers.values())
+    status = {}
+    for router in routers:
+        status.update(router.status())
+    return status
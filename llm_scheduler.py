@@ -0,0 +1,188 @@
+# llm_scheduler.py
+
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+# --------------------------------------
+# Priority-aware admission control for LLM calls
+#
+# All sessions share one scheduler in front of the LLM router, so the number
+# of concurrent backend calls is bounded and a distress message never waits
+# behind routine summaries. Each priority class has its own bounded queue and
+# all classes share one overall bound: a full class queue rejects new work of
+# that class, while a full shared bound sheds pending lower-class work to make
+# room. Queued work whose deadline has passed is shed instead of run late.
+# --------------------------------------
+RISK = 0
+CHAT = 1
+SUMMARY = 2
+BACKGROUND = 3
+
+PRIORITY_NAMES = {RISK: "risk", CHAT: "chat", SUMMARY: "summary", BACKGROUND: "background"}
+
+# Per-class queue bound, bound across all classes, and default deadline
+# (seconds; None = never shed).
+DEFAULT_LIMITS = {RISK: 64, CHAT: 32, SUMMARY: 16, BACKGROUND: 8}
+DEFAULT_MAX_QUEUED = 96
+DEFAULT_DEADLINES = {RISK: None, CHAT: 60.0, SUMMARY: 30.0, BACKGROUND: 10.0}
+
+
+class LoadShedError(RuntimeError):
+    """Raised when a request is rejected or dropped by the scheduler."""
+
+
+class _Job:
+    __slots__ = ("fn", "args", "kwargs", "future", "priority", "enqueued", "deadline")
+
+    def __init__(self, fn, args, kwargs, priority, deadline):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.future = Future()
+        self.priority = priority
+        self.enqueued = time.monotonic()
+        self.deadline = None if deadline is None else self.enqueued + deadline
+
+
+class LLMScheduler:
+    def __init__(
+        self, concurrency=2, limits=None, deadlines=None, max_queued=DEFAULT_MAX_QUEUED
+    ):
+        self.limits = {**DEFAULT_LIMITS, **(limits or {})}
+        self.max_queued = max_queued
+        self.deadlines = {**DEFAULT_DEADLINES, **(deadlines or {})}
+        self._queues = {p: deque() for p in PRIORITY_NAMES}
+        self._cond = threading.Condition()
+        self._stopped = False
+        self.metrics = {
+            p: {
+                "submitted": 0,
+                "completed": 0,
+                "cancelled": 0,
+                "shed": 0,
+                "rejected": 0,
+                "max_wait": 0.0,
+            }
+            for p in PRIORITY_NAMES
+        }
+        self.running = 0
+        self._workers = [
+            threading.Thread(target=self._work, name=f"llm-scheduler-{i}", daemon=True)
+            for i in range(concurrency)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, fn, *args, priority=CHAT, deadline=..., **kwargs):
+        """Queue ``fn(*args, **kwargs)``; returns a Future."""
+        if deadline is ...:
+            deadline = self.deadlines[priority]
+        job = _Job(fn, args, kwargs, priority, deadline)
+        with self._cond:
+            self.metrics[priority]["submitted"] += 1
+            queue = self._queues[priority]
+            full = len(queue) >= self.limits[priority]
+            if not full and self._queued() >= self.max_queued:
+                # Shedding only helps when the shared bound is what is full.
+                full = not self._shed_lower(priority)
+            if full:
+                self.metrics[priority]["rejected"] += 1
+                raise LoadShedError(
+                    f"LLM queue full for {PRIORITY_NAMES[priority]} requests"
+                )
+            queue.append(job)
+            self._cond.notify()
+        return job.future
+
+    def run(self, fn, *args, priority=CHAT, deadline=..., **kwargs):
+        """Submit and wait for the result."""
+        return self.submit(fn, *args, priority=priority, deadline=deadline, **kwargs).result()
+
+    def _queued(self):
+        return sum(len(q) for q in self._queues.values())
+
+    def _shed_lower(self, priority):
+        # Drop the newest pending job from the lowest class below `priority`.
+        for lower in sorted(PRIORITY_NAMES, reverse=True):
+            if lower <= priority:
+                return False
+            if self._queues[lower]:
+                victim = self._queues[lower].pop()
+                self._fail(victim, "shed to admit higher-priority work")
+                return True
+        return False
+
+    def _fail(self, job, reason):
+        self.metrics[job.priority]["shed"] += 1
+        job.future.set_exception(
+            LoadShedError(f"{PRIORITY_NAMES[job.priority]} request {reason}")
+        )
+
+    def _next_job(self):
+        now = time.monotonic()
+        for priority in sorted(PRIORITY_NAMES):
+            queue = self._queues[priority]
+            while queue:
+                job = queue.popleft()
+                if job.deadline is not None and now > job.deadline:
+                    self._fail(job, "missed its deadline")
+                    continue
+                return job
+        return None
+
+    def _work(self):
+        while True:
+            with self._cond:
+                job = self._next_job()
+                while job is None and not self._stopped:
+                    self._cond.wait()
+                    job = self._next_job()
+                if job is None:
+                    return
+                self.running += 1
+                metrics = self.metrics[job.priority]
+                metrics["max_wait"] = max(metrics["max_wait"], time.monotonic() - job.enqueued)
+
+            ran = job.future.set_running_or_notify_cancel()
+            if ran:
+                try:
+                    job.future.set_result(job.fn(*job.args, **job.kwargs))
+                except BaseException as e:
+                    job.future.set_exception(e)
+
+            with self._cond:
+                self.running -= 1
+                self.metrics[job.priority]["completed" if ran else "cancelled"] += 1
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+    def status(self):
+        with self._cond:
+            return {
+                "running": self.running,
+                "queues": {
+                    PRIORITY_NAMES[p]: dict(self.metrics[p], depth=len(q))
+                    for p, q in self._queues.items()
+                },
+            }
+
+
+_shared_scheduler = None
+_shared_lock = threading.Lock()
+
+
+def shared_scheduler():
+    """Process-wide scheduler; GUARDIAN_LLM_CONCURRENCY sets its width."""
+    global _shared_scheduler
+    with _shared_lock:
+        if _shared_scheduler is None:
+            _shared_scheduler = LLMScheduler(
+                concurrency=int(os.getenv("GUARDIAN_LLM_CONCURRENCY", "2"))
+            )
+        return _shared_scheduler
@@ -0,0 +1,276 @@
+# load_test.py
+
+import argparse
+import json
+import os
+import resource
+import threading
+import time
+from collections import defaultdict
+
+import fake_ollama
+
+# --------------------------------------
+# Load test / session replay for GuardianAI
+#
+# Replays multi-turn sessions from a JSONL script against in-process
+# GuardianAI instances (one per virtual user), ramping up to the requested
+# concurrency, with a local fake Ollama server injecting LLM latency:
+#
+#   python load_test.py test_files/replay_sessions.jsonl --users 50 --ramp 30 \
+#       --latency lognormal:0.8:0.5
+#
+# Script lines: {"session": "s1", "type": "text", "content": "...",
+#                "think_time": 1.0}
+# "audio" and "image" turns take "path" and go through Whisper / BLIP; those
+# models are loaded and run once before the ramp so their start-up cost stays
+# out of the measured latencies.
+# The verdict cache is off unless --cache is given, so the numbers measure
+# the LLM path rather than cache hits.
+# --------------------------------------
+
+
+def load_script(path):
+    """Return [(session_name, [turn, ...]), ...] in file order."""
+    sessions = defaultdict(list)
+    with open(path, "r") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                turn = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{path}:{line_number}: {e}")
+            sessions[turn.get("session", "default")].append(turn)
+    return list(sessions.items())
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def rss_mb():
+    try:
+        with open("/proc/self/statm", "r") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        # Peak rather than current RSS, but still shows growth (Linux: KiB).
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def session_state_bytes(guardian):
+    """Approximate bytes retained by one session's conversation state."""
+    memory = guardian.memory
+    return len(
+        json.dumps([guardian.memory_log, memory.buffer, memory.summary]).encode("utf-8")
+    )
+
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.turns = 0
+        self.session_bytes = []
+
+    def turn(self, kind, seconds):
+        with self.lock:
+            self.latencies[kind].append(seconds)
+            self.turns += 1
+
+    def error(self, kind, exc):
+        with self.lock:
+            self.errors[f"{kind}:{type(exc).__name__}"] += 1
+
+
+def message_for(turn):
+    kind = turn.get("type", "text")
+    if kind == "text":
+        return turn["content"]
+    if kind == "audio":
+        from audio2text import process_audio_file
+
+        return f"[Audio Description] {process_audio_file(turn['path'])}"
+    if kind == "image":
+        from image2text import describe_image
+
+        return f"[Image Description] {describe_image(turn['path'])}"
+    raise ValueError(f"Unknown turn type: {kind}")
+
+
+def warm_up(sessions):
+    """Load and run each media model once, outside the timed section."""
+    first = {}
+    for _, turns in sessions:
+        for turn in turns:
+            first.setdefault(turn.get("type", "text"), turn)
+    start = time.perf_counter()
+    for kind in ("audio", "image"):
+        if kind in first:
+            try:
+                message_for(first[kind])
+            except Exception as e:
+                # Those turns will fail and be counted as errors anyway.
+                print(f"⚠️ {kind} warm-up failed: {e}")
+    return time.perf_counter() - start
+
+
+def run_user(guardian_factory, turns, recorder, think_scale, done):
+    try:
+        guardian = guardian_factory()
+        for turn in turns:
+            kind = turn.get("type", "text")
+            start = time.perf_counter()
+            try:
+                message = message_for(turn)
+                guardian.log("user", message)
+                guardian.chat(message)
+            except Exception as e:
+                recorder.error(kind, e)
+            else:
+                recorder.turn(kind, time.perf_counter() - start)
+            time.sleep(turn.get("think_time", 0.0) * think_scale)
+        with recorder.lock:
+            recorder.session_bytes.append(session_state_bytes(guardian))
+    finally:
+        # Hold on to the session until every user is done, so the RSS sample
+        # taken at the barrier includes all sessions.
+        done.wait()
+
+
+def run_load_test(script, users, ramp, guardian_factory, think_scale=1.0):
+    sessions = load_script(script)
+    if not sessions:
+        raise ValueError(f"No sessions in {script}")
+
+    warmup = warm_up(sessions)
+    recorder = Recorder()
+    rss_before = rss_mb()
+    rss_live = []
+    done = threading.Barrier(users, action=lambda: rss_live.append(rss_mb()))
+    threads = []
+    started = time.perf_counter()
+    for i in range(users):
+        _, turns = sessions[i % len(sessions)]
+        thread = threading.Thread(
+            target=run_user,
+            args=(guardian_factory, turns, recorder, think_scale, done),
+            name=f"virtual-user-{i}",
+            daemon=True,
+        )
+        thread.start()
+        threads.append(thread)
+        if ramp and i < users - 1:
+            time.sleep(ramp / users)
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    rss_after = rss_live[0]
+
+    all_latencies = [v for values in recorder.latencies.values() for v in values]
+    report = {
+        "users": users,
+        "warmup_s": round(warmup, 2),
+        "elapsed_s": round(elapsed, 2),
+        "turns": recorder.turns,
+        "throughput_turns_per_s": round(recorder.turns / elapsed, 2) if elapsed else 0.0,
+        "latency_s": {
+            kind: {
+                "count": len(values),
+                "p50": round(percentile(values, 50), 3),
+                "p90": round(percentile(values, 90), 3),
+                "p95": round(percentile(values, 95), 3),
+                "p99": round(percentile(values, 99), 3),
+                "max": round(max(values), 3),
+            }
+            for kind, values in list(recorder.latencies.items()) + [("all", all_latencies)]
+            if values
+        },
+        "errors": dict(recorder.errors),
+        "memory": {
+            "rss_before_mb": round(rss_before, 1),
+            "rss_with_sessions_mb": round(rss_after, 1),
+            "rss_growth_per_session_kb": round((rss_after - rss_before) * 1024 / users, 1),
+            "mean_session_state_kb": round(
+                sum(recorder.session_bytes) / len(recorder.session_bytes) / 1024, 2
+            )
+            if recorder.session_bytes
+            else 0.0,
+        },
+    }
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay sessions against GuardianAI")
+    parser.add_argument("script", help="JSONL session script")
+    parser.add_argument("--users", type=int, default=10, help="concurrent virtual users")
+    parser.add_argument("--ramp", type=float, default=10.0, help="seconds to start all users")
+    parser.add_argument("--think-scale", type=float, default=1.0, help="multiplier for think_time")
+    parser.add_argument("--latency", default="lognormal:0.8:0.5", help="fake LLM latency spec")
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--fake-port", type=int, default=11599)
+    parser.add_argument(
+        "--llm-host", help="use an existing Ollama-compatible host instead of the fake"
+    )
+    parser.add_argument(
+        "--cache", action="store_true", help="enable the verdict cache (off by default)"
+    )
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+    # Read by GuardianAI when it picks its verdict cache.
+    os.environ["GUARDIAN_VERDICT_CACHE"] = "1" if args.cache else "0"
+
+    from app_agent import GuardianAI
+    from llm_scheduler import shared_scheduler
+    from verdict_cache import shared_cache
+
+    fake = None
+    host = args.llm_host
+    if host is None:
+        fake = fake_ollama.serve(
+            port=args.fake_port, latency=args.latency, fail_rate=args.fail_rate
+        )
+        threading.Thread(target=fake.serve_forever, daemon=True).start()
+        host = f"http://127.0.0.1:{args.fake_port}"
+
+    def factory():
+        return GuardianAI(model="gemma3n:e2b", host=host, mode="Local", fallback_hosts=[])
+
+    report = run_load_test(args.script, args.users, args.ramp, factory, args.think_scale)
+
+    report["scheduler"] = shared_scheduler().status()
+    report["verdict_cache"] = shared_cache().stats() if args.cache else "disabled"
+    if fake is not None:
+        llm = fake.stats.snapshot()
+        llm["summaries_per_turn"] = (
+            round(llm["summaries"] / report["turns"], 3) if report["turns"] else 0.0
+        )
+        report["llm"] = llm
+        fake.shutdown()
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(
+            f"\n📊 {report['turns']} turns from {args.users} users in "
+            f"{report['elapsed_s']}s ({report['throughput_turns_per_s']} turns/s)"
+        )
+        for kind, stats in report["latency_s"].items():
+            print(
+                f"  {kind:>6}: p50 {stats['p50']}s  p95 {stats['p95']}s  "
+                f"p99 {stats['p99']}s  max {stats['max']}s  (n={stats['count']})"
+            )
+        print(f"  errors: {report['errors'] or 'none'}")
+        print(f"  memory: {report['memory']}")
+        if "llm" in report:
+            print(f"  llm: {report['llm']}")
+        print(f"  scheduler: {report['scheduler']}")
+        print(f"  verdict cache: {report['verdict_cache']}")
@@ -0,0 +1,316 @@
+# model_snapshot.py
+
+import argparse
+import json
+import mmap
+import os
+import struct
+
+import torch
+
+# --------------------------------------
+# Fast-start model snapshots
+#
+# `prepare` converts a local Hugging Face model dir (models/, audio_models/)
+# into <dir>/snapshot/: a half-precision safetensors file plus config. At
+# startup the weights are mmap'ed copy-on-write and wrapped as tensors in
+# place, so nothing is read until a page is touched and every worker process
+# shares the same page-cache pages instead of holding its own fp32 copy.
+#
+#   python model_snapshot.py prepare                # both models, bfloat16
+#   python model_snapshot.py prepare --dtype float16 --only audio
+#   python model_snapshot.py verify                 # snapshot vs from_pretrained
+#
+# Set GUARDIAN_SNAPSHOTS=0 to always use from_pretrained.
+# --------------------------------------
+SNAPSHOT_DIRNAME = "snapshot"
+WEIGHTS_FILE = "model.safetensors"
+META_FILE = "snapshot.json"
+GENERATION_CONFIG_FILE = "generation_config.json"
+BUFFER_PREFIX = "__buffer__."
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+TEST_FILES = os.path.join(BASE_DIR, "test_files")
+
+SAFETENSORS_DTYPES = {
+    "F64": torch.float64,
+    "F32": torch.float32,
+    "F16": torch.float16,
+    "BF16": torch.bfloat16,
+    "I64": torch.int64,
+    "I32": torch.int32,
+    "I16": torch.int16,
+    "I8": torch.int8,
+    "U8": torch.uint8,
+    "BOOL": torch.bool,
+}
+
+
+def snapshot_dir(model_dir):
+    return os.path.join(model_dir, SNAPSHOT_DIRNAME)
+
+
+def snapshots_enabled():
+    return os.getenv("GUARDIAN_SNAPSHOTS", "1") == "1"
+
+
+def _source_mtime(model_dir):
+    weights = os.path.join(model_dir, "model.safetensors")
+    return os.path.getmtime(weights) if os.path.exists(weights) else 0.0
+
+
+def is_snapshot_current(model_dir):
+    meta_path = os.path.join(snapshot_dir(model_dir), META_FILE)
+    if not os.path.exists(meta_path):
+        return False
+    with open(meta_path, "r") as f:
+        meta = json.load(f)
+    return meta.get("source_mtime", 0.0) >= _source_mtime(model_dir)
+
+
+# --------------------------------------
+# Prepare
+# --------------------------------------
+def prepare_snapshot(model_dir, model_cls, dtype="bfloat16"):
+    """Write <model_dir>/snapshot/ with weights converted to `dtype`."""
+    from safetensors.torch import save_file
+
+    model = model_cls.from_pretrained(model_dir, local_files_only=True)
+    model = model.to(getattr(torch, dtype)).eval()
+    out_dir = snapshot_dir(model_dir)
+    os.makedirs(out_dir, exist_ok=True)
+
+    # Tied weights share storage; store each tensor once and record aliases.
+    tensors, aliases, seen = {}, {}, {}
+    for name, tensor in model.state_dict().items():
+        key = (tensor.data_ptr(), tensor.dtype, tuple(tensor.shape))
+        if key in seen:
+            aliases[name] = seen[key]
+        else:
+            seen[key] = name
+            tensors[name] = tensor.detach().contiguous()
+
+    # Non-persistent buffers are not in state_dict but are still needed.
+    persistent = set(model.state_dict())
+    for name, buffer in model.named_buffers():
+        if name not in persistent:
+            tensors[BUFFER_PREFIX + name] = buffer.detach().contiguous()
+
+    save_file(
+        tensors,
+        os.path.join(out_dir, WEIGHTS_FILE),
+        metadata={"format": "pt", "aliases": json.dumps(aliases)},
+    )
+    model.config.torch_dtype = dtype
+    model.config.save_pretrained(out_dir)
+    if getattr(model, "generation_config", None) is not None:
+        model.generation_config.save_pretrained(out_dir)
+
+    with open(os.path.join(out_dir, META_FILE), "w") as f:
+        json.dump(
+            {
+                "model_class": model_cls.__name__,
+                "dtype": dtype,
+                "source_mtime": _source_mtime(model_dir),
+            },
+            f,
+            indent=4,
+        )
+    print(f"✅ Snapshot written to {out_dir} ({dtype})")
+    return out_dir
+
+
+# --------------------------------------
+# Load
+# --------------------------------------
+def mmap_safetensors(path):
+    """
+    Map a safetensors file copy-on-write and return ({name: tensor}, metadata).
+    Tensors are views into the mapping; pages are only read when touched.
+    """
+    with open(path, "rb") as f:
+        header_len = struct.unpack("<Q", f.read(8))[0]
+        header = json.loads(f.read(header_len))
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+
+    metadata = header.pop("__metadata__", {}) or {}
+    raw = torch.frombuffer(mapping, dtype=torch.uint8)
+    data_start = 8 + header_len
+
+    tensors = {}
+    for name, info in header.items():
+        dtype = SAFETENSORS_DTYPES[info["dtype"]]
+        start, end = info["data_offsets"]
+        chunk = raw[data_start + start : data_start + end]
+        element_size = torch.empty((), dtype=dtype).element_size()
+        if (data_start + start) % element_size:
+            # Misaligned for a zero-copy view; fall back to a private copy.
+            chunk = chunk.clone()
+        tensors[name] = chunk.view(dtype).reshape(info["shape"])
+    return tensors, metadata
+
+
+def load_snapshot(model_dir, model_cls):
+    from transformers import GenerationConfig
+
+    out_dir = snapshot_dir(model_dir)
+    config = model_cls.config_class.from_pretrained(out_dir)
+    with torch.device("meta"):
+        model = model_cls(config)
+    # model_cls(config) derives generation defaults from config.json only;
+    # the checkpoint's own generation_config.json (Whisper's lang/task ids,
+    # suppress_tokens, ...) must be restored to generate like from_pretrained.
+    if os.path.exists(os.path.join(out_dir, GENERATION_CONFIG_FILE)):
+        model.generation_config = GenerationConfig.from_pretrained(out_dir)
+
+    tensors, metadata = mmap_safetensors(os.path.join(out_dir, WEIGHTS_FILE))
+    buffers = {
+        name[len(BUFFER_PREFIX) :]: tensors.pop(name)
+        for name in list(tensors)
+        if name.startswith(BUFFER_PREFIX)
+    }
+    for alias, target in json.loads(metadata.get("aliases", "{}")).items():
+        tensors[alias] = tensors[target]
+
+    model.load_state_dict(tensors, strict=True, assign=True)
+    for name, buffer in buffers.items():
+        module_name, _, buffer_name = name.rpartition(".")
+        module = model.get_submodule(module_name) if module_name else model
+        module._buffers[buffer_name] = buffer
+    model.tie_weights()
+
+    leftover = [n for n, p in model.named_parameters() if p.is_meta]
+    leftover += [n for n, b in model.named_buffers() if b.is_meta]
+    if leftover:
+        raise RuntimeError(f"Snapshot is missing tensors: {leftover[:5]}")
+    return model.eval()
+
+
+def snapshot_dtype(model_dir):
+    with open(os.path.join(snapshot_dir(model_dir), META_FILE), "r") as f:
+        return getattr(torch, json.load(f)["dtype"])
+
+
+def load_model(model_dir, model_cls, **from_pretrained_kwargs):
+    """Load from the snapshot when it is present and current, else from_pretrained."""
+    if snapshots_enabled() and is_snapshot_current(model_dir):
+        try:
+            model = load_snapshot(model_dir, model_cls)
+            print(f"✅ Loaded {model_cls.__name__} from snapshot ({model.dtype})")
+            return model
+        except Exception as e:
+            print(f"⚠️ Snapshot load failed for {model_dir}, using from_pretrained: {e}")
+    return model_cls.from_pretrained(model_dir, **from_pretrained_kwargs)
+
+
+# --------------------------------------
+# Verify
+# --------------------------------------
+def whisper_outputs(model_dir):
+    """generate(model) -> transcripts of the audio in test_files/."""
+    import librosa
+    from transformers import WhisperProcessor
+
+    processor = WhisperProcessor.from_pretrained(model_dir, use_fast=False)
+    paths = sorted(
+        os.path.join(TEST_FILES, name)
+        for name in os.listdir(TEST_FILES)
+        if name.endswith((".wav", ".mp3"))
+    )
+
+    def generate(model):
+        outputs = []
+        for path in paths:
+            waveform, _ = librosa.load(path, sr=16000, mono=True)
+            features = processor(audio=waveform, sampling_rate=16000, return_tensors="pt")
+            with torch.no_grad():
+                ids = model.generate(features["input_features"].to(model.dtype))
+            outputs.append(processor.batch_decode(ids, skip_special_tokens=True)[0])
+        return outputs
+
+    return generate
+
+
+def blip_outputs(model_dir):
+    """generate(model) -> captions of the images in test_files/."""
+    from PIL import Image
+    from transformers import BlipProcessor
+
+    processor = BlipProcessor.from_pretrained(model_dir, local_files_only=True, use_fast=False)
+    paths = sorted(
+        os.path.join(TEST_FILES, name)
+        for name in os.listdir(TEST_FILES)
+        if name.endswith((".jpg", ".jpeg", ".png"))
+    )
+
+    def generate(model):
+        outputs = []
+        for path in paths:
+            inputs = processor(images=Image.open(path).convert("RGB"), return_tensors="pt")
+            inputs["pixel_values"] = inputs["pixel_values"].to(model.dtype)
+            with torch.no_grad():
+                ids = model.generate(**inputs, max_length=50)
+            outputs.append(processor.decode(ids[0], skip_special_tokens=True).strip())
+        return outputs
+
+    return generate
+
+
+def verify_snapshot(model_dir, model_cls, generate):
+    """
+    Run ``generate(model)`` on the snapshot and on from_pretrained at the
+    snapshot's dtype. Returns (ok, snapshot_outputs, reference_outputs); any
+    difference means the snapshot does not load the same model.
+    """
+    snapshot = load_snapshot(model_dir, model_cls)
+    reference = model_cls.from_pretrained(
+        model_dir, local_files_only=True, torch_dtype=snapshot_dtype(model_dir)
+    ).eval()
+
+    def generation_settings(model):
+        settings = model.generation_config.to_dict()
+        settings.pop("transformers_version", None)
+        return settings
+
+    same_config = generation_settings(snapshot) == generation_settings(reference)
+    if not same_config:
+        print(f"❌ generation_config differs for {model_dir}")
+    snapshot_outputs = generate(snapshot)
+    reference_outputs = generate(reference)
+    ok = same_config and snapshot_outputs == reference_outputs
+    return ok, snapshot_outputs, reference_outputs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prepare fast-start model snapshots")
+    parser.add_argument("command", choices=["prepare", "verify"])
+    parser.add_argument("--dtype", default="bfloat16", choices=["bfloat16", "float16"])
+    parser.add_argument("--only", choices=["audio", "image"])
+    args = parser.parse_args()
+
+    from transformers import BlipForConditionalGeneration, WhisperForConditionalGeneration
+
+    targets = {
+        "audio": (
+            os.path.join(BASE_DIR, "audio_models"),
+            WhisperForConditionalGeneration,
+            whisper_outputs,
+        ),
+        "image": (os.path.join(BASE_DIR, "models"), BlipForConditionalGeneration, blip_outputs),
+    }
+    failed = False
+    for name, (model_dir, model_cls, outputs) in targets.items():
+        if args.only not in (None, name):
+            continue
+        if args.command == "prepare":
+            prepare_snapshot(model_dir, model_cls, dtype=args.dtype)
+            continue
+        ok, snapshot_outputs, reference_outputs = verify_snapshot(
+            model_dir, model_cls, outputs(model_dir)
+        )
+        print(f"{'✅' if ok else '❌'} {name} snapshot parity")
+        for got, expected in zip(snapshot_outputs, reference_outputs):
+            print(f"   snapshot:        {got}\n   from_pretrained: {expected}")
+        failed = failed or not ok
+    if failed:
+        raise SystemExit(1)
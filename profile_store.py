@@ -0,0 +1,192 @@
+# profile_store.py
+
+import copy
+import datetime
+import json
+import os
+import threading
+import time
+
+from db import ThreadLocalDB
+
+# --------------------------------------
+# Multi-user profile store
+#
+# Profiles live in sqlite (WAL) keyed by user id, with emergency contacts in
+# their own table for fast lookup at alert time. Reads go through an
+# in-process cache that is invalidated on every write from this process;
+# writes from other processes become visible after `cache_ttl` seconds.
+# --------------------------------------
+PROFILE_DB = os.getenv("GUARDIAN_PROFILE_DB", "profiles.db")
+LEGACY_PROFILE_FILE = "user_profile.json"
+DEFAULT_USER = "default"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS profiles (
+    user_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    last_updated TEXT NOT NULL,
+    version INTEGER NOT NULL DEFAULT 1
+);
+CREATE TABLE IF NOT EXISTS contacts (
+    user_id TEXT NOT NULL,
+    label TEXT NOT NULL,
+    address TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (user_id, label)
+);
+"""
+
+
+def default_profile():
+    now = datetime.datetime.now().isoformat()
+    return {
+        "name": "User",
+        "emergency_contacts": {
+            "Mom": "+1-6948310",
+            "Dad": "+1-6648380",
+            "Spouse": "+1-67438910",
+            "Emergency": "911",
+        },
+        "created_at": now,
+        "last_updated": now,
+    }
+
+
+class ProfileStore:
+    def __init__(self, db_path=PROFILE_DB, cache_ttl=5.0, legacy_file=LEGACY_PROFILE_FILE):
+        self.db = ThreadLocalDB(db_path, SCHEMA)
+        self.cache_ttl = cache_ttl
+        self.legacy_file = legacy_file
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    # ---------- cache ----------
+    def _cached(self, user_id):
+        with self._lock:
+            entry = self._cache.get(user_id)
+        if entry and time.monotonic() - entry[0] < self.cache_ttl:
+            return entry[1]
+        return None
+
+    def _remember(self, user_id, profile):
+        with self._lock:
+            self._cache[user_id] = (time.monotonic(), profile)
+
+    def invalidate(self, user_id=None):
+        with self._lock:
+            if user_id is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(user_id, None)
+
+    # ---------- storage ----------
+    def _read(self, conn, user_id):
+        row = conn.execute(
+            "SELECT name, created_at, last_updated FROM profiles WHERE user_id = ?",
+            (user_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        contacts = conn.execute(
+            "SELECT label, address FROM contacts WHERE user_id = ? ORDER BY position",
+            (user_id,),
+        ).fetchall()
+        return {
+            "name": row["name"],
+            "emergency_contacts": {c["label"]: c["address"] for c in contacts},
+            "created_at": row["created_at"],
+            "last_updated": row["last_updated"],
+        }
+
+    def _write(self, conn, user_id, profile):
+        profile["last_updated"] = datetime.datetime.now().isoformat()
+        profile.setdefault("created_at", profile["last_updated"])
+        conn.execute(
+            """
+            INSERT INTO profiles (user_id, name, created_at, last_updated)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT (user_id) DO UPDATE SET
+                name = excluded.name,
+                last_updated = excluded.last_updated,
+                version = version + 1
+            """,
+            (user_id, profile.get("name") or "User", profile["created_at"], profile["last_updated"]),
+        )
+        conn.execute("DELETE FROM contacts WHERE user_id = ?", (user_id,))
+        conn.executemany(
+            "INSERT INTO contacts (user_id, label, address, position) VALUES (?, ?, ?, ?)",
+            [
+                (user_id, label, address, i)
+                for i, (label, address) in enumerate(
+                    profile.get("emergency_contacts", {}).items()
+                )
+            ],
+        )
+
+    def _initial_profile(self, user_id):
+        # The single-user JSON file seeds the default user on first run.
+        if user_id == DEFAULT_USER and self.legacy_file and os.path.exists(self.legacy_file):
+            try:
+                with open(self.legacy_file, "r") as f:
+                    return json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"⚠️ Could not import {self.legacy_file}: {e}")
+        return default_profile()
+
+    # ---------- public API ----------
+    def get(self, user_id=DEFAULT_USER):
+        """Return a copy of the user's profile, creating it if needed."""
+        profile = self._cached(user_id)
+        if profile is None:
+            # Plain reads stay deferred so WAL readers never take the write lock.
+            with self.db.transaction("DEFERRED") as conn:
+                profile = self._read(conn, user_id)
+            if profile is None:
+                with self.db.transaction() as conn:
+                    # Re-check: another writer may have created it meanwhile.
+                    profile = self._read(conn, user_id)
+                    if profile is None:
+                        profile = self._initial_profile(user_id)
+                        self._write(conn, user_id, profile)
+            self._remember(user_id, profile)
+        return copy.deepcopy(profile)
+
+    def save(self, user_id, profile):
+        profile = copy.deepcopy(profile)
+        self.invalidate(user_id)
+        with self.db.transaction() as conn:
+            self._write(conn, user_id, profile)
+        self._remember(user_id, profile)
+        return copy.deepcopy(profile)
+
+    def update(self, user_id, fn):
+        """
+        Atomically read-modify-write a profile: ``fn`` receives the current
+        profile and mutates it (or returns a replacement) while the write lock
+        is held, so concurrent updates never clobber each other.
+        """
+        self.invalidate(user_id)
+        with self.db.transaction() as conn:
+            profile = self._read(conn, user_id) or self._initial_profile(user_id)
+            result = fn(profile)
+            if result is not None:
+                profile = result
+            self._write(conn, user_id, profile)
+        self._remember(user_id, profile)
+        return copy.deepcopy(profile)
+
+    def get_contacts(self, user_id=DEFAULT_USER):
+        """Emergency contacts as {label: address}, served from cache when warm."""
+        profile = self._cached(user_id)
+        if profile is not None:
+            return dict(profile["emergency_contacts"])
+        conn = self.db.connection()
+        rows = conn.execute(
+            "SELECT label, address FROM contacts WHERE user_id = ? ORDER BY position",
+            (user_id,),
+        ).fetchall()
+        if not rows:
+            return dict(self.get(user_id)["emergency_contacts"])
+        return {row["label"]: row["address"] for row in rows}
@@ -0,0 +1,117 @@
+# risk_trajectory.py
+
+import time
+from collections import deque
+
+# --------------------------------------
+# Incremental per-session risk state
+#
+# Every verdict updates a handful of running values in O(1): a ring buffer of
+# recent verdicts, a time-decayed risk score, and fast/slow EWMAs whose gap
+# measures how quickly risk is rising. Escalation also requires every one of
+# the last few verdicts to sit clearly above the mean of the ones before them,
+# so a lone spike or an oscillating L/M pattern does not count. The summary is
+# small enough to be fed back into the prompt each turn instead of the raw
+# history.
+# --------------------------------------
+RISK_SCORES = {"low": 0.0, "medium": 0.5, "high": 1.0}
+
+
+class RiskTrajectory:
+    def __init__(
+        self,
+        capacity=32,
+        half_life=600.0,
+        alpha=0.5,
+        fast_alpha=0.6,
+        slow_alpha=0.15,
+        escalation_threshold=0.2,
+        window=3,
+    ):
+        self.history = deque(maxlen=capacity)
+        self.half_life = half_life
+        self.alpha = alpha
+        self.fast_alpha = fast_alpha
+        self.slow_alpha = slow_alpha
+        self.escalation_threshold = escalation_threshold
+        self.window = window
+        self.score = 0.0
+        self.fast = 0.0
+        self.slow = 0.0
+        self.peak = 0.0
+        self.turns = 0
+        self.last_update = None
+
+    def update(self, verdict, now=None):
+        """Fold one {Risk, Action, ...} verdict into the running state."""
+        now = time.time() if now is None else now
+        risk_label = str(verdict.get("Risk", "")).strip().lower()
+        if risk_label not in RISK_SCORES:
+            return self.state()
+        risk = RISK_SCORES[risk_label]
+
+        if self.last_update is not None:
+            # Quiet periods cool the score down before the new verdict lands.
+            # The EWMAs are left alone: decaying them too drags the slow one
+            # down further, so a steady High stream would read as rising.
+            self.score *= 0.5 ** ((now - self.last_update) / self.half_life)
+
+        if not self.turns:
+            # Seed with the first verdict so a steady stream reads as steady.
+            self.fast = self.slow = risk
+        self.score = self.alpha * risk + (1 - self.alpha) * self.score
+        self.fast = self.fast_alpha * risk + (1 - self.fast_alpha) * self.fast
+        self.slow = self.slow_alpha * risk + (1 - self.slow_alpha) * self.slow
+        self.peak = max(self.peak, risk)
+        self.turns += 1
+        self.last_update = now
+        self.history.append((now, risk, str(verdict.get("Action", ""))))
+        return self.state()
+
+    @property
+    def escalation_rate(self):
+        return self.fast - self.slow
+
+    @property
+    def escalating(self):
+        if self.escalation_rate < self.escalation_threshold:
+            return False
+        risks = [risk for _, risk, _ in self.history]
+        recent, earlier = risks[-self.window :], risks[: -self.window]
+        if not earlier:
+            return False
+        # A sustained rise: even the lowest recent verdict clears the baseline.
+        shift = min(recent) - sum(earlier) / len(earlier)
+        return shift >= self.escalation_threshold
+
+    @property
+    def trend(self):
+        if self.escalation_rate >= self.escalation_threshold / 2:
+            return "rising"
+        if self.escalation_rate <= -self.escalation_threshold / 2:
+            return "falling"
+        return "steady"
+
+    def state(self):
+        return {
+            "turns": self.turns,
+            "score": round(self.score, 3),
+            "escalation_rate": round(self.escalation_rate, 3),
+            "trend": self.trend,
+            "escalating": self.escalating,
+            "peak": self.peak,
+            "recent": [risk for _, risk, _ in list(self.history)[-5:]],
+        }
+
+    def as_prompt_feature(self):
+        """One-line summary for the system context, or '' before any verdict."""
+        if not self.turns:
+            return ""
+        recent = "".join(
+            "LMH"[int(risk * 2)] for _, risk, _ in list(self.history)[-8:]
+        )
+        return (
+            f"(Risk trajectory): score={self.score:.2f} trend={self.trend} "
+            f"escalating={'yes' if self.escalating else 'no'} "
+            f"recent={recent} turns={self.turns}"
+        )
@@ -0,0 +1,522 @@
+# service.py
+
+import argparse
+import asyncio
+import functools
+import json
+import os
+import tempfile
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from app_agent import GuardianAI, parse_verdict
+from llm_router import shared_router_status
+from llm_scheduler import LoadShedError, shared_scheduler
+from verdict_cache import shared_cache
+
+# --------------------------------------
+# Headless analysis service
+#
+#   POST /analyze/text                 {"session_id": "...", "text": "..."}
+#   POST /analyze/audio?session_id=..  raw .wav/.mp3 body (&format=mp3)
+#   POST /analyze/image?session_id=..  raw .png/.jpg body
+#   GET  /sessions/<id>/log            conversation log for a session
+#   DELETE /sessions/<id>              drop a session
+#   GET  /health                       load, sessions and backend status
+#   POST /stream/audio?session_id=..   chunked live PCM feed (live_audio.py)
+#
+# Analysis responses stream NDJSON events ("accepted", "transcript"/
+# "description", "verdict", "error") using chunked transfer encoding.
+# --------------------------------------
+MAX_BODY_BYTES = 25 * 1024 * 1024
+
+STATUS_TEXT = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+
+class Overloaded(Exception):
+    """Raised when the service has too many pending requests."""
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class Session:
+    def __init__(self, guardian):
+        self.guardian = guardian
+        self.lock = asyncio.Lock()
+        self.last_used = time.monotonic()
+
+
+class AnalysisService:
+    """
+    Wraps GuardianAI and the audio/image pipelines for many clients.
+
+    Each session gets its own GuardianAI (and therefore its own memory);
+    turns within a session are serialized, sessions run in parallel up to
+    ``max_concurrency`` and at most ``max_pending`` requests may wait before
+    new ones are rejected with 503.
+    """
+
+    def __init__(
+        self,
+        guardian_factory,
+        max_concurrency=4,
+        max_pending=32,
+        max_sessions=256,
+        session_ttl=3600,
+    ):
+        self.guardian_factory = guardian_factory
+        self.max_pending = max_pending
+        self.max_sessions = max_sessions
+        self.session_ttl = session_ttl
+        self.sessions = OrderedDict()
+        self._creating = {}  # session_id -> task building its Session
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix="guardian-worker"
+        )
+
+    # ---------- sessions ----------
+    async def get_session(self, session_id):
+        session = self.sessions.get(session_id)
+        if session is None:
+            # Concurrent first requests for one id must share a single Session.
+            creating = self._creating.get(session_id)
+            if creating is None:
+                creating = asyncio.ensure_future(self._create_session(session_id))
+                self._creating[session_id] = creating
+            session = await asyncio.shield(creating)
+        if session_id in self.sessions:
+            self.sessions.move_to_end(session_id)
+        session.last_used = time.monotonic()
+        return session
+
+    async def _create_session(self, session_id):
+        try:
+            guardian = await self._run_blocking(self.guardian_factory)
+            session = Session(guardian)
+            self.sessions[session_id] = session
+            self._evict_sessions()
+            return session
+        finally:
+            self._creating.pop(session_id, None)
+
+    def _evict_sessions(self):
+        now = time.monotonic()
+        for session_id in list(self.sessions):
+            session = self.sessions[session_id]
+            expired = now - session.last_used > self.session_ttl
+            if (expired or len(self.sessions) > self.max_sessions) and not session.lock.locked():
+                del self.sessions[session_id]
+
+    def drop_session(self, session_id):
+        return self.sessions.pop(session_id, None) is not None
+
+    # ---------- execution ----------
+    async def _run_blocking(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, fn, *args)
+
+    def _admit(self):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise Overloaded(f"{self.pending} requests pending")
+        self.pending += 1
+
+    async def analyze(self, session_id, kind, payload, suffix=None):
+        """Async generator of analysis events for one turn."""
+        self._admit()
+        try:
+            yield {"event": "accepted", "session_id": session_id}
+            session = await self.get_session(session_id)
+            async with session.lock, self._slots:
+                if kind == "text":
+                    message = payload
+                elif kind == "audio":
+                    caption = await self._run_blocking(_transcribe_bytes, payload, suffix)
+                    yield {"event": "transcript", "text": caption}
+                    message = f"[Audio Description] {caption}"
+                elif kind == "image":
+                    caption = await self._run_blocking(_describe_bytes, payload, suffix)
+                    yield {"event": "description", "text": caption}
+                    message = f"[Image Description] {caption}"
+                else:
+                    raise HTTPError(404, f"Unknown analysis kind: {kind}")
+
+                reply = await self._run_blocking(_guardian_turn, session.guardian, message)
+                trajectory = session.guardian.trajectory.state()
+            self.completed += 1
+            yield {
+                "event": "verdict",
+                "reply": reply,
+                "verdict": parse_verdict(reply),
+                "trajectory": trajectory,
+            }
+        finally:
+            self.pending -= 1
+
+    def health(self):
+        # Routers, scheduler and cache are process-wide, shared by all sessions.
+        cache_enabled = os.getenv("GUARDIAN_VERDICT_CACHE", "1") == "1"
+        return {
+            "pending": self.pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "sessions": len(self.sessions),
+            "backends": shared_router_status(),
+            "verdict_cache": shared_cache().stats() if cache_enabled else {},
+            "scheduler": shared_scheduler().status(),
+        }
+
+
+def _guardian_turn(guardian, message):
+    guardian.log("user", message)
+    reply, _ = guardian.chat(message)
+    return reply
+
+
+def _with_temp_file(data, suffix, fn):
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
+        tmp.write(data)
+    try:
+        return fn(tmp.name)
+    finally:
+        os.unlink(tmp.name)
+
+
+def _transcribe_bytes(data, suffix):
+    # Imported lazily: loading Whisper is only paid for if audio is used.
+    from audio2text import process_audio_file
+
+    return _with_temp_file(data, suffix or ".wav", process_audio_file)
+
+
+def _describe_bytes(data, suffix):
+    from image2text import describe_image
+
+    return _with_temp_file(data, suffix or ".png", describe_image)
+
+
+# --------------------------------------
+# Minimal HTTP/1.1 front end (asyncio streams)
+# --------------------------------------
+async def _read_request(reader):
+    request_line = (await reader.readline()).decode("latin-1").strip()
+    if not request_line:
+        return None
+    try:
+        method, target, _ = request_line.split(" ", 2)
+    except ValueError:
+        raise HTTPError(400, "Malformed request line")
+
+    headers = {}
+    while True:
+        line = (await reader.readline()).decode("latin-1")
+        if line in ("\r\n", "\n", ""):
+            break
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    url = urllib.parse.urlsplit(target)
+    query = dict(urllib.parse.parse_qsl(url.query))
+    return method.upper(), url.path, query, headers
+
+
+async def read_chunks(reader, headers):
+    """Yield the request body in pieces (Content-Length or chunked)."""
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        while True:
+            size_line = await reader.readline()
+            size = int(size_line.split(b";")[0].strip() or b"0", 16)
+            if size == 0:
+                await reader.readline()
+                return
+            chunk = await reader.readexactly(size)
+            await reader.readexactly(2)
+            yield chunk
+    else:
+        remaining = int(headers.get("content-length", 0))
+        while remaining > 0:
+            chunk = await reader.read(min(remaining, 64 * 1024))
+            if not chunk:
+                return
+            remaining -= len(chunk)
+            yield chunk
+
+
+async def _read_body(reader, headers):
+    if int(headers.get("content-length", 0)) > MAX_BODY_BYTES:
+        raise HTTPError(413, "Request body too large")
+    body = bytearray()
+    async for chunk in read_chunks(reader, headers):
+        body.extend(chunk)
+        if len(body) > MAX_BODY_BYTES:
+            raise HTTPError(413, "Request body too large")
+    return bytes(body)
+
+
+async def _send_json(writer, status, payload, extra_headers=None):
+    body = json.dumps(payload).encode()
+    head = [
+        f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}",
+        "Content-Type: application/json",
+        f"Content-Length: {len(body)}",
+        "Connection: close",
+    ] + list(extra_headers or [])
+    writer.write(("\r\n".join(head) + "\r\n\r\n").encode() + body)
+    await writer.drain()
+
+
+async def send_stream(writer, events):
+    head = [
+        "HTTP/1.1 200 OK",
+        "Content-Type: application/x-ndjson",
+        "Transfer-Encoding: chunked",
+        "Connection: close",
+    ]
+    writer.write(("\r\n".join(head) + "\r\n\r\n").encode())
+    try:
+        async for event in events:
+            line = (json.dumps(event) + "\n").encode()
+            writer.write(f"{len(line):x}\r\n".encode() + line + b"\r\n")
+            await writer.drain()
+    except Exception as e:
+        error = {"event": "error", "error": str(e), "type": type(e).__name__}
+        line = (json.dumps(error) + "\n").encode()
+        writer.write(f"{len(line):x}\r\n".encode() + line + b"\r\n")
+    writer.write(b"0\r\n\r\n")
+    await writer.drain()
+
+
+def _suffix(query, headers, default):
+    fmt = query.get("format")
+    if fmt:
+        return "." + fmt.lstrip(".")
+    content_type = headers.get("content-type", "")
+    for marker, suffix in (
+        ("mpeg", ".mp3"),
+        ("mp3", ".mp3"),
+        ("wav", ".wav"),
+        ("jpeg", ".jpg"),
+        ("png", ".png"),
+    ):
+        if marker in content_type:
+            return suffix
+    return default
+
+
+class ServiceServer:
+    def __init__(self, service):
+        self.service = service
+        # Extra routes: (method, path) -> async handler(reader, writer, query, headers)
+        self.routes = {}
+
+    async def handle(self, reader, writer):
+        try:
+            request = await _read_request(reader)
+            if request is not None:
+                await self.dispatch(reader, writer, *request)
+        except HTTPError as e:
+            await _send_json(writer, e.status, {"error": str(e)})
+        except Overloaded as e:
+            await _send_json(
+                writer, 503, {"error": f"Overloaded: {e}"}, ["Retry-After: 1"]
+            )
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as e:
+            print(f"❌ Service error: {e}")
+            try:
+                await _send_json(writer, 500, {"error": str(e)})
+            except ConnectionError:
+                pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, reader, writer, method, path, query, headers):
+        service = self.service
+        handler = self.routes.get((method, path))
+        if handler is not None:
+            await handler(reader, writer, query, headers)
+            return
+
+        if path == "/health" and method == "GET":
+            await _send_json(writer, 200, service.health())
+            return
+
+        if path.startswith("/sessions/"):
+            parts = path.strip("/").split("/")
+            session_id = parts[1] if len(parts) > 1 else ""
+            if method == "GET" and parts[2:] == ["log"]:
+                session = service.sessions.get(session_id)
+                log = session.guardian.memory_log if session else []
+                await _send_json(writer, 200, {"session_id": session_id, "log": log})
+            elif method == "DELETE" and len(parts) == 2:
+                await _send_json(writer, 200, {"dropped": service.drop_session(session_id)})
+            else:
+                raise HTTPError(404, f"No route for {method} {path}")
+            return
+
+        if not path.startswith("/analyze/"):
+            raise HTTPError(404, f"No route for {method} {path}")
+        if method != "POST":
+            raise HTTPError(405, "Use POST for analysis requests")
+
+        kind = path[len("/analyze/") :]
+        body = await _read_body(reader, headers)
+        if kind == "text":
+            try:
+                payload = json.loads(body or b"{}")
+            except json.JSONDecodeError:
+                raise HTTPError(400, "Body must be JSON")
+            text = payload.get("text", "").strip()
+            if not text:
+                raise HTTPError(400, "Missing 'text'")
+            session_id = payload.get("session_id") or query.get("session_id") or "default"
+            events = service.analyze(session_id, "text", text)
+        elif kind in ("audio", "image"):
+            if not body:
+                raise HTTPError(400, f"Empty {kind} body")
+            session_id = query.get("session_id", "default")
+            default = ".wav" if kind == "audio" else ".png"
+            events = service.analyze(
+                session_id, kind, body, suffix=_suffix(query, headers, default)
+            )
+        else:
+            raise HTTPError(404, f"Unknown analysis kind: {kind}")
+
+        # Admission happens on the first step so 503 is sent before streaming.
+        first = await events.__anext__()
+        await send_stream(writer, _prepend(first, events))
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle, host, port)
+        print(f"🛡️ GuardianAI service listening on http://{host}:{port}")
+        async with server:
+            await server.serve_forever()
+
+
+async def _prepend(first, events):
+    yield first
+    async for event in events:
+        yield event
+
+
+# --------------------------------------
+# Client used by the Streamlit UI when GUARDIAN_SERVICE_URL is set
+# --------------------------------------
+class _TrajectorySnapshot:
+    """Last risk trajectory state reported by the service."""
+
+    def __init__(self):
+        self.last_state = {}
+
+    def state(self):
+        return dict(self.last_state)
+
+
+class RemoteGuardian:
+    """Drop-in for the parts of GuardianAI the Streamlit app uses."""
+
+    def __init__(self, base_url, mode="Local", session_id=None, timeout=120):
+        self.base_url = base_url.rstrip("/")
+        self.mode = mode
+        self.session_id = session_id or uuid.uuid4().hex
+        self.timeout = timeout
+        self.trajectory = _TrajectorySnapshot()
+
+    def _events(self, path, data, content_type):
+        request = urllib.request.Request(
+            self.base_url + path,
+            data=data,
+            headers={"Content-Type": content_type},
+            method="POST",
+        )
+        try:
+            response = urllib.request.urlopen(request, timeout=self.timeout)
+        except urllib.error.HTTPError as e:
+            if e.code == 503:
+                # Admission control rejected the turn; same contract as local mode.
+                raise LoadShedError(f"GuardianAI service overloaded: {e.reason}")
+            raise
+        with response:
+            for line in response:
+                if line.strip():
+                    yield json.loads(line)
+
+    def chat(self, user_input, summarize_mode=False):
+        data = json.dumps({"session_id": self.session_id, "text": user_input}).encode()
+        for event in self._events("/analyze/text", data, "application/json"):
+            if event["event"] == "verdict":
+                self.trajectory.last_state = event.get("trajectory") or {}
+                return event["reply"], ""
+            if event["event"] == "error":
+                if event.get("type") == LoadShedError.__name__:
+                    raise LoadShedError(event["error"])
+                raise RuntimeError(event["error"])
+        raise RuntimeError("GuardianAI service returned no verdict.")
+
+    @property
+    def memory_log(self):
+        url = f"{self.base_url}/sessions/{self.session_id}/log"
+        try:
+            with urllib.request.urlopen(url, timeout=self.timeout) as response:
+                return json.loads(response.read())["log"]
+        except OSError as e:
+            print(f"⚠️ Could not fetch conversation log: {e}")
+            return []
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="GuardianAI analysis service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8600)
+    parser.add_argument("--mode", default="Local", choices=["Local", "Demo"])
+    parser.add_argument("--model", default="gemma3n:e2b")
+    parser.add_argument("--ollama-host", default="http://127.0.0.1:11502")
+    parser.add_argument("--max-concurrency", type=int, default=4)
+    parser.add_argument("--max-pending", type=int, default=32)
+    args = parser.parse_args()
+
+    from live_audio import handle_http_stream
+
+    if args.mode == "Demo":
+        factory = lambda: GuardianAI(model="gemma-3n-e2b-it", mode="Demo")  # noqa: E731
+    else:
+        factory = lambda: GuardianAI(  # noqa: E731
+            model=args.model, host=args.ollama_host, mode="Local"
+        )
+
+    async def main():
+        service = AnalysisService(
+            factory, max_concurrency=args.max_concurrency, max_pending=args.max_pending
+        )
+        server = ServiceServer(service)
+        server.routes[("POST", "/stream/audio")] = functools.partial(
+            handle_http_stream, service
+        )
+        await server.serve(args.host, args.port)
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        print("\nGuardianAI service: Shutting down.")
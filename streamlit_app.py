@@ -1,16 +1,23 @@
 import streamlit as st
 from app_agent import GuardianAI
-from audio2text import processor as audio_processor, model as audio_model
+from llm_scheduler import LoadShedError
+from audio2text import process_audio_file
 from image2text import describe_image
+from profile_store import DEFAULT_USER, ProfileStore
+from alert_dispatch import (
+    AlertDispatcher,
+    AlertQueue,
+    make_idempotency_key,
+    transport_from_env,
+)
 
-import torch
-import librosa
 import datetime
 import tempfile
 from PIL import Image
 import json
 import os
 import re
+import uuid
 
 # -------------------------------
 # Page Config & Styling
@@ -108,43 +115,42 @@ st.markdown(
 # -------------------------------
 # User Profile Management
 # -------------------------------
-PROFILE_FILE = "user_profile.json"
+@st.cache_resource
+def get_profile_store():
+    """Process-wide profile store (sqlite + read-through cache)"""
+    return ProfileStore()
+
+
+def get_user_id():
+    """Profiles are keyed by the ?user= query parameter"""
+    return st.query_params.get("user", DEFAULT_USER)
 
 
 def load_user_profile():
-    """Load user profile from file or create default"""
+    """Load the current user's profile from the store (created on first use)"""
     try:
-        if os.path.exists(PROFILE_FILE):
-            with open(PROFILE_FILE, "r") as f:
-                return json.load(f)
-        else:
-            # Return default profile
-            return {
-                "name": "User",
-                "emergency_contacts": {
-                    "Mom": "+1-6948310",
-                    "Dad": "+1-6648380",
-                    "Spouse": "+1-67438910",
-                    "Emergency": "911",
-                },
-                "created_at": datetime.datetime.now().isoformat(),
-                "last_updated": datetime.datetime.now().isoformat(),
-            }
+        return get_profile_store().get(get_user_id())
     except Exception as e:
         st.error(f"Error loading profile: {e}")
         return {"name": "User", "emergency_contacts": {}}
 
 
-def save_user_profile(profile):
-    """Save user profile to file"""
+def update_user_profile(changes):
+    """
+    Apply the edited fields to the stored profile under the store's write
+    lock, so concurrent edits to other fields are not overwritten. Returns the
+    updated profile, or None on failure.
+    """
+
+    def apply(profile):
+        profile["name"] = changes["name"]
+        profile.setdefault("emergency_contacts", {}).update(changes["emergency_contacts"])
+
     try:
-        profile["last_updated"] = datetime.datetime.now().isoformat()
-        with open(PROFILE_FILE, "w") as f:
-            json.dump(profile, f, indent=4)
-        return True
+        return get_profile_store().update(get_user_id(), apply)
     except Exception as e:
         st.error(f"Error saving profile: {e}")
-        return False
+        return None
 
 
 def get_user_name():
@@ -154,6 +160,15 @@ def get_user_name():
     return st.session_state.user_profile.get("name", "User")
 
 
+# -------------------------------
+# Alert Dispatch
+# -------------------------------
+@st.cache_resource
+def get_alert_dispatcher():
+    """One durable queue + background dispatcher shared by all sessions"""
+    return AlertDispatcher(AlertQueue(), transport_from_env()).start()
+
+
 # -------------------------------
 # Init
 # -------------------------------
@@ -168,8 +183,15 @@ st.sidebar.title("Demo Mode Selection")
 mode = st.sidebar.radio("Choose Demo Mode:", ["Local", "Demo"], key="model_mode")
 
 # Initialize GuardianAI based on mode
+SERVICE_URL = os.getenv("GUARDIAN_SERVICE_URL")
+
 if st.session_state.guardian is None or st.session_state.guardian.mode != mode:
-    if mode == "Demo":
+    if SERVICE_URL:
+        # Headless service does the analysis; this UI is just another client.
+        from service import RemoteGuardian
+
+        st.session_state.guardian = RemoteGuardian(SERVICE_URL, mode=mode)
+    elif mode == "Demo":
         st.session_state.guardian = GuardianAI(model="gemma-3n-e2b-it", mode="Demo")
     else:
         st.session_state.guardian = GuardianAI(
@@ -186,8 +208,8 @@ if "user_profile" not in st.session_state:
 if "chat_history" not in st.session_state:
     st.session_state.chat_history = []
 
-if "contact_log" not in st.session_state:
-    st.session_state.contact_log = []
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
 
 if "nudge" not in st.session_state:
     st.session_state.nudge = ""
@@ -198,6 +220,9 @@ if "mode" not in st.session_state:
 if "awaiting_confirmation" not in st.session_state:
     st.session_state.awaiting_confirmation = False
 
+if "alert_nonce" not in st.session_state:
+    st.session_state.alert_nonce = ""
+
 if "show_emergency" not in st.session_state:
     st.session_state.show_emergency = False
 
@@ -206,21 +231,26 @@ if "show_emergency" not in st.session_state:
 # Utilities
 # -------------------------------
 def process_audio(file_path):
-    waveform, sr = librosa.load(file_path, sr=16000, mono=True)
-    inputs = audio_processor(audio=waveform, sampling_rate=16000, return_tensors="pt")
-    with torch.no_grad():
-        generated_ids = audio_model.generate(inputs["input_features"])
-        caption = audio_processor.batch_decode(generated_ids, skip_special_tokens=True)[
-            0
-        ]
-    return caption
+    return process_audio_file(file_path)
+
+
+def request_confirmation(kind, nudge):
+    st.session_state.nudge = nudge
+    st.session_state.awaiting_confirmation = kind
+    # One nonce per prompt: reruns of this prompt dedupe, later emergencies don't.
+    st.session_state.alert_nonce = uuid.uuid4().hex
 
 
 def chat_with_guardian(message):
     guardian = st.session_state.guardian
     # Use the chat method instead of process_message
     st.session_state.chat_history.append({"role": "user", "content": message})
-    response, _ = guardian.chat(message)
+    try:
+        response, _ = guardian.chat(message)
+    except LoadShedError:
+        response = "⏳ GuardianAI is busy right now. Please send your message again in a moment."
+        st.session_state.chat_history.append({"role": "assistant", "content": response})
+        return response
     st.session_state.chat_history.append({"role": "assistant", "content": response})
     try:
         matches = re.findall(r"\{[\s\S]*?\}", response)
@@ -230,25 +260,40 @@ def chat_with_guardian(message):
             action = parsed.get("Action", "").strip().lower()
 
             if action == "emergency contact" and st.session_state.mode == "Assistive":
-                st.session_state.nudge = "🚨 GuardianAI suggests notifying emergency contacts. Do you want to proceed?"
-                st.session_state.awaiting_confirmation = "emergency"
+                request_confirmation(
+                    "emergency",
+                    "🚨 GuardianAI suggests notifying emergency contacts. Do you want to proceed?",
+                )
                 break
 
             elif action == "nudge":
-                st.session_state.nudge = "💛 I noticed some signs of distress. Just checking in — If you are in danger, please let me know."
-                st.session_state.awaiting_confirmation = "nudge"
+                request_confirmation(
+                    "nudge",
+                    "💛 I noticed some signs of distress. Just checking in — If you are in danger, please let me know.",
+                )
                 break
 
             elif action == "emergency contact":
                 if st.session_state.mode == "Autonomous":
+                    st.session_state.alert_nonce = uuid.uuid4().hex
                     confirm_emergency_action("yes")
                 else:
-                    st.session_state.nudge = "🚨 GuardianAI suggests notifying emergency contacts. Do you want to proceed?"
-                    st.session_state.awaiting_confirmation = "emergency"
+                    request_confirmation(
+                        "emergency",
+                        "🚨 GuardianAI suggests notifying emergency contacts. Do you want to proceed?",
+                    )
                 break
     except Exception as e:
         print("Emergency detection failed:", e)
 
+    # Catch slow escalations that no single verdict flagged on its own.
+    trajectory = guardian.trajectory.state()
+    if trajectory.get("escalating") and not st.session_state.awaiting_confirmation:
+        request_confirmation(
+            "nudge",
+            "📈 Your recent messages suggest things are getting harder. Just checking in — If you are in danger, please let me know.",
+        )
+
     return response
 
 
@@ -276,18 +321,39 @@ def handle_image_upload(image_file):
 
 
 def render_contact_log():
-    for who, msg in st.session_state.contact_log:
+    alerts = get_alert_dispatcher().queue.alerts_for(st.session_state.session_id)
+    status_icons = {"pending": "⏳", "sending": "📤", "sent": "✅", "failed": "❌"}
+    for alert in alerts:
+        timestamp = datetime.datetime.fromtimestamp(alert["created_at"]).strftime(
+            "%H:%M:%S"
+        )
+        icon = status_icons.get(alert["status"], "")
         st.markdown(
             f"""
             <div style='margin-bottom:16px'>
-                <div style='color:#8be9fd;font-weight:bold;margin-bottom:4px'>{who}</div>
-                {msg}
+                <div style='color:#8be9fd;font-weight:bold;margin-bottom:4px'>[{timestamp}] → {alert['contact_name']} {icon} {alert['status']}</div>
+                {alert['body']}
             </div>
             """,
             unsafe_allow_html=True,
         )
 
 
+def render_trajectory():
+    guardian = st.session_state.guardian
+    trajectory = guardian.trajectory.state() if guardian is not None else {}
+    if not trajectory.get("turns"):
+        st.write("📈 No risk verdicts yet.")
+        return
+    st.write(
+        f"Score: **{trajectory['score']:.2f}** · Trend: **{trajectory['trend']}** · "
+        f"Turns: {trajectory['turns']}"
+    )
+    if trajectory["escalating"]:
+        st.warning("Risk has been escalating over recent turns.")
+    st.line_chart(trajectory["recent"])
+
+
 def render_log():
     guardian = st.session_state.guardian
     if guardian is None:
@@ -328,13 +394,10 @@ def render_log():
 
 
 def confirm_emergency_action(choice):
-    timestamp = datetime.datetime.now().strftime("%H:%M:%S")
     user_name = get_user_name()
 
     # Get current emergency contacts first
-    current_emergency_contacts = st.session_state.user_profile.get(
-        "emergency_contacts", {}
-    )
+    current_emergency_contacts = get_profile_store().get_contacts(get_user_id())
 
     if choice == "yes":
         last_message = (
@@ -343,6 +406,8 @@ def confirm_emergency_action(choice):
             else "GuardianAI detected an emergency."
         )
 
+        trajectory = st.session_state.guardian.trajectory.state()
+
         try:
             matches = re.findall(r"\{[\s\S]*?\}", last_message)
             parsed = json.loads(matches[0]) if matches else {}
@@ -353,15 +418,28 @@ def confirm_emergency_action(choice):
                 <strong>Guardian AI Analysis:</strong><br>
                 • <b>Risk</b>: <span style='color:#ff5555'>{parsed.get('Risk', 'Unknown')}</span><br>
                 • <b>Analysis</b>: {parsed.get('Analysis', '')}<br>
-                • <b>Action</b>: {parsed.get('Action', '')}
+                • <b>Action</b>: {parsed.get('Action', '')}<br>
+                • <b>Trend</b>: {trajectory.get('trend', 'unknown')} (score {trajectory.get('score', 0)}, {'escalating' if trajectory.get('escalating') else 'not escalating'})
             </div>
             """
         except Exception:
             formatted_msg = f"🚨 EMERGENCY ALERT: {user_name} needs assistance.\nGuardian AI Analysis: {last_message}"
 
-        for contact in current_emergency_contacts:
-            st.session_state.contact_log.append(
-                (f"[{timestamp}] → {contact}", formatted_msg)
+        # Queue the alert; the background dispatcher delivers it. The
+        # idempotency key (per confirmation prompt) makes reruns a no-op.
+        queue = get_alert_dispatcher().queue
+        session_id = st.session_state.session_id
+        prompt_id = st.session_state.alert_nonce or uuid.uuid4().hex
+        contacts = {c: a for c, a in current_emergency_contacts.items() if a}
+        queued = 0
+        for contact, address in contacts.items():
+            queued += queue.enqueue(
+                session_id,
+                contact,
+                address,
+                f"🚨 EMERGENCY ALERT: {user_name} needs assistance",
+                formatted_msg,
+                make_idempotency_key(session_id, prompt_id, contact),
             )
 
         st.session_state.chat_history.append(
@@ -370,7 +448,11 @@ def confirm_emergency_action(choice):
         st.session_state.chat_history.append(
             {
                 "role": "guardian",
-                "content": f"Sent alert to all contacts:\n{formatted_msg}",
+                "content": (
+                    f"Queued alert for all contacts:\n{formatted_msg}"
+                    if queued or not contacts
+                    else "This alert was already queued; no duplicate was sent."
+                ),
             }
         )
 
@@ -432,18 +514,20 @@ with st.sidebar:
             )
 
             if st.form_submit_button("💾 Save Profile"):
-                # Update profile
-                st.session_state.user_profile["name"] = (
-                    new_name if new_name.strip() else "User"
+                updated = update_user_profile(
+                    {
+                        "name": new_name if new_name.strip() else "User",
+                        "emergency_contacts": {
+                            "Mom": mom_contact,
+                            "Dad": dad_contact,
+                            "Spouse": spouse_contact,
+                            "Emergency": emergency_contact,
+                        },
+                    }
                 )
-                st.session_state.user_profile["emergency_contacts"] = {
-                    "Mom": mom_contact,
-                    "Dad": dad_contact,
-                    "Spouse": spouse_contact,
-                    "Emergency": emergency_contact,
-                }
-
-                if save_user_profile(st.session_state.user_profile):
+
+                if updated is not None:
+                    st.session_state.user_profile = updated
                     st.success("✅ Profile saved successfully!")
                     # Force rerun to update emergency contacts throughout the app
                     st.rerun()
@@ -460,6 +544,9 @@ with st.sidebar:
     else:
         st.button("📞 View Emergency Messages", on_click=show_emergency_messages)
 
+    with st.expander("📈 Risk Trajectory"):
+        render_trajectory()
+
     with st.expander("📜 Conversation Log"):
         render_log()
 
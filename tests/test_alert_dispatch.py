@@ -0,0 +1,101 @@
+import sqlite3
+import time
+
+import pytest
+
+from alert_dispatch import AlertDispatcher, AlertQueue, LogTransport, make_idempotency_key
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return AlertQueue(str(tmp_path / "alerts.db"))
+
+
+def enqueue(queue, prompt_id="prompt-1", contact="Alex"):
+    key = make_idempotency_key("session", prompt_id, contact)
+    return queue.enqueue("session", contact, "+1 555 0100", "Alert", "<p>help</p>", key)
+
+
+def test_duplicate_key_is_ignored(queue):
+    assert enqueue(queue)
+    assert not enqueue(queue)
+    assert enqueue(queue, prompt_id="prompt-2")
+    assert len(queue.alerts_for("session")) == 2
+
+
+def test_failed_delivery_backs_off(queue):
+    dispatcher = AlertDispatcher(queue, LogTransport(fail_rate=1.0), base_backoff=10.0)
+    enqueue(queue)
+
+    before = time.time()
+    assert dispatcher.dispatch_due() == 1
+    # Not due again until the backoff (10 s, jittered to 5-10 s) has passed.
+    assert dispatcher.dispatch_due() == 0
+
+    (alert,) = queue.alerts_for("session")
+    assert alert["status"] == "pending"
+    assert alert["attempts"] == 1
+    assert alert["last_error"] == "injected delivery failure"
+    assert before + 5.0 <= alert["next_attempt_at"] <= time.time() + 10.0
+
+
+def test_alert_fails_permanently_after_max_attempts(queue):
+    transport = LogTransport(fail_rate=1.0)
+    dispatcher = AlertDispatcher(queue, transport, max_attempts=3, base_backoff=0.0)
+    enqueue(queue)
+
+    for _ in range(3):
+        assert dispatcher.dispatch_due() == 1
+    assert dispatcher.dispatch_due() == 0
+
+    (alert,) = queue.alerts_for("session")
+    assert alert["status"] == "failed"
+    assert alert["attempts"] == 3
+    assert transport.delivered == []
+
+
+def test_successful_delivery_is_sent_once(queue):
+    transport = LogTransport()
+    dispatcher = AlertDispatcher(queue, transport)
+    enqueue(queue)
+
+    assert dispatcher.dispatch_due() == 1
+    assert dispatcher.dispatch_due() == 0
+    assert len(transport.delivered) == 1
+    assert queue.counts() == {"sent": 1}
+
+
+def test_live_claim_of_another_dispatcher_is_not_requeued(tmp_path):
+    path = str(tmp_path / "alerts.db")
+    first = AlertQueue(path)
+    second = AlertQueue(path)
+    enqueue(first)
+
+    assert len(first.claim_due()) == 1
+    # A second process starting up must not steal the in-flight alert...
+    assert second.requeue_expired() == 0
+    assert second.claim_due() == []
+    # ...but it does recover the claim once its lease has run out.
+    expired = AlertQueue(path, lease=0.0)
+    assert expired.requeue_expired() == 1
+    assert len(expired.claim_due()) == 1
+
+
+def test_old_database_gains_claimed_at_column(tmp_path):
+    path = str(tmp_path / "alerts.db")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE alerts (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+        "idempotency_key TEXT NOT NULL UNIQUE, session_id TEXT NOT NULL, "
+        "contact_name TEXT NOT NULL, contact_address TEXT NOT NULL, "
+        "subject TEXT NOT NULL, body TEXT NOT NULL, "
+        "status TEXT NOT NULL DEFAULT 'pending', attempts INTEGER NOT NULL DEFAULT 0, "
+        "next_attempt_at REAL NOT NULL, last_error TEXT, created_at REAL NOT NULL, "
+        "sent_at REAL)"
+    )
+    conn.close()
+
+    queue = AlertQueue(path)
+    enqueue(queue)
+    (alert,) = queue.claim_due()
+    assert "claimed_at" in alert
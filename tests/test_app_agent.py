@@ -0,0 +1,38 @@
+import threading
+
+import pytest
+
+pytest.importorskip("ollama")
+pytest.importorskip("streamlit")
+pytest.importorskip("dotenv")
+
+import fake_ollama  # noqa: E402
+from app_agent import GuardianAI  # noqa: E402
+from verdict_cache import VerdictCache  # noqa: E402
+
+
+@pytest.fixture
+def fake_server():
+    server = fake_ollama.serve(port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_repeated_message_is_served_from_cache(fake_server):
+    host = f"http://127.0.0.1:{fake_server.server_address[1]}"
+    guardian = GuardianAI(
+        model="fake", host=host, fallback_hosts=[], verdict_cache=VerdictCache()
+    )
+
+    replies = []
+    for _ in range(2):
+        # Callers log the user turn first, so the buffer differs between calls.
+        guardian.log("user", "I'm fine, just tired.")
+        reply, _ = guardian.chat("I'm fine, just tired.")
+        replies.append(reply)
+
+    assert replies[0] == replies[1]
+    assert fake_server.stats.snapshot()["requests"] == 1
+    assert guardian.verdict_cache.stats()["hits"] == 1
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from live_audio import SAMPLE_RATE, LiveAudioMonitor
+
+
+def silence(seconds):
+    return np.zeros(int(seconds * SAMPLE_RATE), dtype=np.float32)
+
+
+def tone(seconds, amplitude=0.3):
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    return (amplitude * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+
+
+def pcm(*parts):
+    samples = np.concatenate(parts)
+    return (samples * 32767).astype("<i2").tobytes()
+
+
+@pytest.fixture
+def run_monitor():
+    def run(data, chunk=3200, **kwargs):
+        transcribed, segments = [], []
+
+        def transcribe(audio):
+            transcribed.append(len(audio) / SAMPLE_RATE)
+            return "speech"
+
+        monitor = LiveAudioMonitor(
+            lambda text, start, end: segments.append((start, end)),
+            transcribe=transcribe,
+            **kwargs,
+        )
+        # Odd chunk sizes also exercise the carried-over half sample.
+        for offset in range(0, len(data), chunk):
+            monitor.feed(data[offset : offset + chunk])
+        monitor.close()
+        return transcribed, segments
+
+    return run
+
+
+def test_click_is_not_transcribed(run_monitor):
+    transcribed, segments = run_monitor(pcm(silence(1.0), tone(0.03, 0.5), silence(1.0)))
+    assert transcribed == []
+    assert segments == []
+
+
+def test_speech_between_clicks_is_one_segment(run_monitor):
+    data = pcm(
+        silence(1.0), tone(0.03, 0.5), silence(1.0), tone(1.5), silence(1.0), tone(0.03, 0.5)
+    )
+    _, segments = run_monitor(data, chunk=3201)
+
+    assert len(segments) == 1
+    start, end = segments[0]
+    # Speech starts at 2.03 s; the segment keeps the 0.2 s preroll before it.
+    assert start == pytest.approx(1.83, abs=0.05)
+    assert 3.5 <= end <= 4.2
+
+
+def test_long_speech_is_cut_at_max_segment(run_monitor):
+    transcribed, segments = run_monitor(
+        pcm(silence(0.5), tone(3.2), silence(1.0)), max_segment=1.0
+    )
+
+    assert len(segments) >= 3
+    assert all(length <= 1.0 + 0.03 for length in transcribed)
+    # Consecutive cuts continue where the previous one ended.
+    for (_, end), (start, _) in zip(segments, segments[1:]):
+        assert start == pytest.approx(end)
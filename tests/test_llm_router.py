@@ -0,0 +1,143 @@
+import json
+import threading
+import time
+
+import pytest
+
+import fake_ollama
+from llm_router import BackendUnavailable, LLMRouter, OllamaBackend, shared_router
+
+
+class TimedBackend(OllamaBackend):
+    """OllamaBackend that records when each call returned or raised."""
+
+    def __init__(self, port, timeout=5.0):
+        super().__init__(f"http://127.0.0.1:{port}", "fake", timeout=timeout)
+        self.cancel_events = []
+        self.finished = []
+
+    def call(self, messages, cancel_event):
+        self.cancel_events.append(cancel_event)
+        try:
+            return super().call(messages, cancel_event)
+        finally:
+            self.finished.append(time.monotonic())
+
+
+@pytest.fixture
+def fake_server():
+    servers = []
+
+    def start(latency=0.0, fail_rate=0.0):
+        server = fake_ollama.serve(port=0, latency=latency, fail_rate=fail_rate)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        start.stats[server.server_address[1]] = server.stats
+        return server.server_address[1]
+
+    start.stats = {}
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+MESSAGES = [{"role": "user", "content": "hello"}]
+
+
+def test_falls_back_when_primary_fails(fake_server):
+    broken = TimedBackend(fake_server(fail_rate=1.0))
+    healthy = TimedBackend(fake_server())
+    router = LLMRouter([broken, healthy])
+
+    reply = router.call(MESSAGES)
+
+    assert json.loads(reply) == fake_ollama.DEFAULT_REPLY
+    status = router.status()
+    assert status[broken.name]["failures"] == 1
+    assert status[healthy.name]["calls"] == 1
+    # The failed backend now ranks behind the one that answered.
+    assert router.ranked()[0] is healthy
+
+
+def test_hung_primary_times_out_and_falls_back(fake_server):
+    hung = TimedBackend(fake_server(latency=5.0), timeout=0.3)
+    healthy = TimedBackend(fake_server())
+    router = LLMRouter([hung, healthy])
+
+    start = time.monotonic()
+    reply = router.call(MESSAGES)
+
+    assert json.loads(reply) == fake_ollama.DEFAULT_REPLY
+    assert time.monotonic() - start < 2.0
+    assert router.status()[hung.name]["failures"] == 1
+
+
+def test_hedge_wins_and_cancels_slow_primary(fake_server):
+    slow = TimedBackend(fake_server(latency=2.0))
+    fast = TimedBackend(fake_server(latency=0.05))
+    router = LLMRouter([slow, fast], default_hedge_delay=0.2)
+
+    start = time.monotonic()
+    reply = router.call(MESSAGES, hedge=True)
+    elapsed = time.monotonic() - start
+
+    assert json.loads(reply) == fake_ollama.DEFAULT_REPLY
+    assert 0.2 <= elapsed < 1.5
+    assert slow.cancel_events[0].is_set()
+    assert not fast.cancel_events[0].is_set()
+    status = router.status()
+    assert status[fast.name]["calls"] == 1
+    # The cancelled loser is timed as censored, not counted as a call or failure.
+    assert status[slow.name]["calls"] == 0
+    assert status[slow.name]["failures"] == 0
+    assert status[slow.name]["ewma_latency"] >= 0.2
+    assert router.ranked()[0] is fast
+
+
+def test_cancel_releases_loser_still_waiting_for_first_token(fake_server):
+    slow = TimedBackend(fake_server(latency=3.0))
+    fast = TimedBackend(fake_server(latency=0.05))
+    router = LLMRouter([slow, fast], default_hedge_delay=0.2)
+
+    router.call(MESSAGES, hedge=True)
+    returned = time.monotonic()
+
+    # The loser never saw a chunk; shutting its socket down must end the call
+    # now rather than after the 3 s prompt evaluation (or the timeout).
+    deadline = returned + 1.0
+    while not slow.finished and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert slow.finished and slow.finished[0] - returned < 0.5
+
+
+def test_fallback_after_primary_failure_is_not_hedged(fake_server):
+    broken = TimedBackend(fake_server(fail_rate=1.0))
+    fallback = TimedBackend(fake_server(latency=0.5))
+    third_port = fake_server()
+    third = TimedBackend(third_port)
+    router = LLMRouter([broken, fallback, third], default_hedge_delay=0.2)
+
+    reply = router.call(MESSAGES, hedge=True)
+
+    assert json.loads(reply) == fake_ollama.DEFAULT_REPLY
+    assert len(fallback.cancel_events) == 1
+    assert third.cancel_events == []
+    assert fake_server.stats[third_port].snapshot()["requests"] == 0
+
+
+def test_all_backends_failing_raises(fake_server):
+    router = LLMRouter([TimedBackend(fake_server(fail_rate=1.0)) for _ in range(2)])
+    with pytest.raises(BackendUnavailable):
+        router.call(MESSAGES)
+
+
+def test_shared_router_is_reused_per_backend_set(fake_server):
+    port = fake_server()
+    first = shared_router([TimedBackend(port)])
+    second = shared_router([TimedBackend(port)])
+    other = shared_router([TimedBackend(fake_server())])
+
+    assert first is second
+    assert other is not first
@@ -0,0 +1,87 @@
+import threading
+
+import pytest
+
+from llm_scheduler import BACKGROUND, RISK, SUMMARY, LLMScheduler, LoadShedError
+
+
+@pytest.fixture
+def blocked_scheduler():
+    """A one-worker scheduler whose worker is stuck until the test ends."""
+    gate = threading.Event()
+    schedulers = []
+
+    def make(**kwargs):
+        scheduler = LLMScheduler(concurrency=1, **kwargs)
+        started = threading.Event()
+
+        def block():
+            started.set()
+            gate.wait()
+
+        scheduler.submit(block, priority=RISK)
+        started.wait()
+        schedulers.append(scheduler)
+        return scheduler
+
+    yield make
+    gate.set()
+    for scheduler in schedulers:
+        scheduler.stop()
+
+
+def depth(scheduler, name):
+    return scheduler.status()["queues"][name]["depth"]
+
+
+def test_class_limit_is_enforced_even_with_lower_work_queued(blocked_scheduler):
+    scheduler = blocked_scheduler(limits={RISK: 2})
+    summaries = [scheduler.submit(lambda: None, priority=SUMMARY) for _ in range(10)]
+
+    admitted = 0
+    for _ in range(12):
+        try:
+            scheduler.submit(lambda: None, priority=RISK)
+            admitted += 1
+        except LoadShedError:
+            pass
+
+    assert admitted == 2
+    assert depth(scheduler, "risk") == 2
+    # The shared bound was never hit, so no summary was shed for nothing.
+    assert depth(scheduler, "summary") == 10
+    assert not any(f.done() for f in summaries)
+
+
+def test_shared_bound_sheds_lower_class_work(blocked_scheduler):
+    scheduler = blocked_scheduler(max_queued=3)
+    background = [scheduler.submit(lambda: None, priority=BACKGROUND) for _ in range(3)]
+
+    scheduler.submit(lambda: None, priority=RISK)
+
+    assert depth(scheduler, "risk") == 1
+    assert depth(scheduler, "background") == 2
+    with pytest.raises(LoadShedError):
+        background[-1].result(timeout=1)
+    with pytest.raises(LoadShedError):
+        # Nothing below background to shed.
+        scheduler.submit(lambda: None, priority=BACKGROUND)
+
+
+def test_cancelled_jobs_are_not_counted_as_completed():
+    scheduler = LLMScheduler(concurrency=1)
+    gate = threading.Event()
+    scheduler.submit(gate.wait, priority=RISK)
+    cancelled = scheduler.submit(lambda: None, priority=SUMMARY)
+    assert cancelled.cancel()
+    queued = scheduler.submit(lambda: "ok", priority=SUMMARY)
+
+    gate.set()
+    assert queued.result(timeout=1) == "ok"
+    scheduler.stop()
+    for worker in scheduler._workers:
+        worker.join(timeout=1)
+
+    summary = scheduler.status()["queues"]["summary"]
+    assert summary["completed"] == 1
+    assert summary["cancelled"] == 1
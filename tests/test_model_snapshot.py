@@ -0,0 +1,123 @@
+import os
+
+import pytest
+
+torch = pytest.importorskip("torch")
+transformers = pytest.importorskip("transformers")
+pytest.importorskip("safetensors")
+
+import model_snapshot  # noqa: E402
+
+TARGETS = {
+    "audio": ("audio_models", "WhisperForConditionalGeneration", model_snapshot.whisper_outputs),
+    "image": ("models", "BlipForConditionalGeneration", model_snapshot.blip_outputs),
+}
+
+
+@pytest.mark.parametrize("kind", sorted(TARGETS))
+def test_snapshot_generates_like_from_pretrained(kind):
+    pytest.importorskip("librosa")
+    dirname, class_name, outputs = TARGETS[kind]
+    model_dir = os.path.join(model_snapshot.BASE_DIR, dirname)
+    weights = os.path.join(model_dir, "model.safetensors")
+    if not os.path.exists(weights) or os.path.getsize(weights) < 1024 * 1024:
+        pytest.skip(f"{dirname} weights not downloaded (git-lfs pointer)")
+    model_cls = getattr(transformers, class_name)
+    if not model_snapshot.is_snapshot_current(model_dir):
+        model_snapshot.prepare_snapshot(model_dir, model_cls)
+
+    ok, snapshot_outputs, reference_outputs = model_snapshot.verify_snapshot(
+        model_dir, model_cls, outputs(model_dir)
+    )
+
+    assert snapshot_outputs == reference_outputs
+    assert ok
+
+
+# --------------------------------------
+# Round trip on tiny random models (no checked-in weights needed)
+# --------------------------------------
+def tiny_whisper():
+    config = transformers.WhisperConfig(
+        vocab_size=64,
+        num_mel_bins=8,
+        d_model=16,
+        encoder_layers=1,
+        decoder_layers=1,
+        encoder_attention_heads=2,
+        decoder_attention_heads=2,
+        encoder_ffn_dim=32,
+        decoder_ffn_dim=32,
+        max_source_positions=16,
+        max_target_positions=16,
+        pad_token_id=0,
+        bos_token_id=1,
+        eos_token_id=2,
+        decoder_start_token_id=1,
+    )
+    model = transformers.WhisperForConditionalGeneration(config)
+    inputs = {
+        "input_features": torch.randn(1, 8, 32),
+        "decoder_input_ids": torch.tensor([[1, 5, 6]]),
+    }
+    return model, inputs
+
+
+def tiny_blip():
+    layers = {"intermediate_size": 32, "num_hidden_layers": 1, "num_attention_heads": 2}
+    config = transformers.BlipConfig(
+        text_config={
+            "vocab_size": 64, "hidden_size": 16, "max_position_embeddings": 16, **layers
+        },
+        vision_config={"hidden_size": 16, "image_size": 32, "patch_size": 8, **layers},
+        projection_dim=16,
+    )
+    model = transformers.BlipForConditionalGeneration(config)
+    inputs = {
+        "pixel_values": torch.randn(1, 3, 32, 32),
+        "input_ids": torch.tensor([[1, 5, 6]]),
+    }
+    return model, inputs
+
+
+def shared_groups(model):
+    """Names of state_dict entries that share storage, as a set of frozensets."""
+    groups = {}
+    for name, tensor in model.state_dict().items():
+        groups.setdefault(tensor.data_ptr(), set()).add(name)
+    return {frozenset(names) for names in groups.values() if len(names) > 1}
+
+
+@pytest.mark.parametrize("build", [tiny_whisper, tiny_blip], ids=["whisper", "blip"])
+def test_tiny_model_round_trip(tmp_path, build):
+    torch.manual_seed(0)
+    model, inputs = build()
+    # A non-default value only generation_config.json carries.
+    model.generation_config.max_length = 7
+    model.save_pretrained(tmp_path)
+    model_cls = type(model)
+
+    model_snapshot.prepare_snapshot(str(tmp_path), model_cls, dtype="float32")
+    assert model_snapshot.is_snapshot_current(str(tmp_path))
+    loaded = model_snapshot.load_snapshot(str(tmp_path), model_cls)
+    reference = model_cls.from_pretrained(tmp_path, local_files_only=True).eval()
+
+    # assign=True left no parameter or buffer on the meta device.
+    assert not any(p.is_meta for p in loaded.parameters())
+    assert not any(b.is_meta for b in loaded.buffers())
+    # Every persistent tensor, including aliased ones, round-trips exactly.
+    expected = reference.state_dict()
+    actual = loaded.state_dict()
+    assert actual.keys() == expected.keys()
+    for name, tensor in expected.items():
+        assert torch.equal(actual[name], tensor), name
+    # Non-persistent buffers are restored too.
+    actual_buffers = dict(loaded.named_buffers())
+    for name, buffer in reference.named_buffers():
+        assert torch.equal(actual_buffers[name], buffer), name
+    # tie_weights() re-linked tied parameters instead of leaving copies.
+    assert shared_groups(loaded) == shared_groups(reference)
+    assert loaded.generation_config.max_length == 7
+
+    with torch.no_grad():
+        assert torch.equal(loaded(**inputs).logits, reference(**inputs).logits)
@@ -0,0 +1,72 @@
+import json
+import threading
+
+import pytest
+
+from profile_store import DEFAULT_USER, ProfileStore
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "profiles.db")
+
+
+@pytest.fixture
+def store(db_path, tmp_path):
+    return ProfileStore(db_path, cache_ttl=60.0, legacy_file=str(tmp_path / "missing.json"))
+
+
+def test_save_invalidates_cache(store):
+    profile = store.get("alice")
+    store.save("alice", dict(profile, name="Alice"))
+    assert store.get("alice")["name"] == "Alice"
+
+
+def test_returned_profile_does_not_alias_cache(store):
+    store.get("alice")["emergency_contacts"]["Mom"] = "tampered"
+    assert store.get("alice")["emergency_contacts"]["Mom"] != "tampered"
+
+
+def test_other_process_writes_visible_after_ttl(db_path, store):
+    store.get("alice")
+    other = ProfileStore(db_path, cache_ttl=0.0)
+    other.update("alice", lambda p: p.update(name="Renamed"))
+
+    assert store.get("alice")["name"] != "Renamed"
+    store.invalidate("alice")
+    assert store.get("alice")["name"] == "Renamed"
+
+
+def test_legacy_json_seeds_default_user_only(db_path, tmp_path):
+    legacy = tmp_path / "user_profile.json"
+    legacy.write_text(
+        json.dumps({"name": "Legacy", "emergency_contacts": {"Sister": "+1-555-0199"}})
+    )
+    store = ProfileStore(db_path, legacy_file=str(legacy))
+
+    profile = store.get(DEFAULT_USER)
+    assert profile["name"] == "Legacy"
+    assert store.get_contacts(DEFAULT_USER) == {"Sister": "+1-555-0199"}
+    assert store.get("someone-else")["name"] == "User"
+
+
+def test_concurrent_updates_are_not_lost(db_path, store):
+    store.save("alice", dict(store.get("alice"), name="0"))
+
+    def increment(profile):
+        profile["name"] = str(int(profile["name"]) + 1)
+
+    def worker():
+        # One store per thread stands in for separate app processes.
+        own = ProfileStore(db_path, cache_ttl=0.0)
+        for _ in range(25):
+            own.update("alice", increment)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    store.invalidate("alice")
+    assert store.get("alice")["name"] == "200"
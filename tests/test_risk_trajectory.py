@@ -0,0 +1,42 @@
+import pytest
+
+from risk_trajectory import RiskTrajectory
+
+
+def feed(labels):
+    """Feed one verdict per letter (L/M/H) a minute apart; return every state."""
+    trajectory = RiskTrajectory()
+    names = {"L": "Low", "M": "Medium", "H": "High"}
+    return [
+        trajectory.update({"Risk": names[label], "Action": "No concern"}, now=60.0 * i)
+        for i, label in enumerate(labels)
+    ]
+
+
+@pytest.mark.parametrize("labels", ["LLLLLL", "MMMMMM", "HHHHHH"])
+def test_steady_stream_is_not_escalating(labels):
+    states = feed(labels)
+    assert not any(state["escalating"] for state in states)
+    assert states[-1]["trend"] == "steady"
+
+
+def test_lone_spike_is_not_escalating():
+    states = feed("LLLLLH")
+    assert states[-1]["trend"] == "rising"
+    assert not states[-1]["escalating"]
+
+
+def test_oscillation_is_not_escalating():
+    states = feed("LMLMLMLM")
+    assert not any(state["escalating"] for state in states)
+
+
+def test_slow_rise_escalates_once_sustained():
+    states = feed("LLLMMM")
+    # Two Mediums could still be noise; the third makes the rise sustained.
+    assert not any(state["escalating"] for state in states[:5])
+    assert states[5]["escalating"]
+
+
+def test_sharp_rise_escalates():
+    assert feed("LLLHHH")[-1]["escalating"]
@@ -0,0 +1,64 @@
+import json
+
+import pytest
+
+from verdict_cache import VerdictCache, context_scope, cosine, embed, normalize
+
+LOW = json.dumps({"Risk": "Low", "Analysis": "All clear", "Action": "No concern"})
+SCOPE = context_scope("session", "Local", "model", "[]")
+
+
+def test_exact_repeat_hits():
+    cache = VerdictCache()
+    cache.put("I'm fine.", SCOPE, LOW, "Low")
+    assert cache.get("i'm   FINE", SCOPE) == LOW
+    assert cache.stats()["hits"] == 1
+
+
+@pytest.mark.parametrize(
+    "cached, query",
+    [
+        ("everything is fine at home", "everything is not fine at home"),
+        ("everything is not fine at home", "everything is fine at home"),
+        ("everything is fine at home", "everything isn't fine at home"),
+        ("everything is fine at home", "everything isn’t fine at home"),
+    ],
+)
+def test_negated_near_duplicate_is_not_served(cached, query):
+    # The trigram embeddings clear the threshold, so only the negation guard
+    # keeps the cached Low verdict from being reused.
+    assert cosine(embed(normalize(cached)), embed(normalize(query))) >= 0.85
+    cache = VerdictCache(threshold=0.85)
+    cache.put(cached, SCOPE, LOW, "Low")
+    assert cache.get(query, SCOPE) is None
+    assert cache.stats()["near_hits"] == 0
+
+
+def test_pair_from_review_scores_above_threshold():
+    similarity = cosine(
+        embed(normalize("everything is fine at home")),
+        embed(normalize("everything is not fine at home")),
+    )
+    assert similarity >= VerdictCache().threshold
+
+
+def test_near_duplicate_without_negation_hits():
+    cache = VerdictCache()
+    cache.put("everything is fine at home", SCOPE, LOW, "Low")
+    assert cache.get("everything is fine at home ok", SCOPE) == LOW
+    assert cache.stats()["near_hits"] == 1
+
+
+def test_scopes_are_isolated():
+    cache = VerdictCache()
+    cache.put("yes", SCOPE, LOW, "Low")
+    other_session = context_scope("other-session", "Local", "model", "[]")
+    other_context = context_scope("session", "Local", "model", '[{"role": "user"}]')
+    assert cache.get("yes", other_session) is None
+    assert cache.get("yes", other_context) is None
+
+
+def test_high_risk_is_never_cached():
+    cache = VerdictCache()
+    assert not cache.put("please hurry", SCOPE, LOW, "High")
+    assert cache.get("please hurry", SCOPE) is None
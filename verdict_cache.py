@@ -0,0 +1,187 @@
+# verdict_cache.py
+
+import hashlib
+import math
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+# --------------------------------------
+# Cache of recent risk verdicts for repeated / near-duplicate messages
+#
+# Lookups are scoped by a context key (session + the exact context the LLM
+# would see), so a change in context never reuses a stale verdict. Within a
+# scope a message hits on an exact normalized fingerprint, or on a small
+# hashed character-trigram embedding above a cosine similarity threshold.
+# A near-hit is refused when the two messages differ by a negation word,
+# since "is fine" and "is not fine" embed almost identically.
+# --------------------------------------
+EMBEDDING_DIM = 256
+CACHEABLE_RISKS = {"low", "medium"}
+NEGATION_WORDS = frozenset(
+    "not no never nothing nobody none nowhere neither nor cannot without "
+    "dont doesnt didnt isnt arent wasnt werent cant couldnt wont wouldnt "
+    "shouldnt havent hasnt hadnt aint".split()
+)
+
+_PUNCTUATION = re.compile(r"[^\w\s']+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize(text):
+    text = (text or "").lower().replace("\u2019", "'")
+    text = _PUNCTUATION.sub(" ", text)
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def fingerprint(normalized):
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+
+def embed(normalized, dim=EMBEDDING_DIM):
+    """Sparse L2-normalized bag of hashed character trigrams."""
+    padded = f"  {normalized}  "
+    vector = {}
+    for i in range(len(padded) - 2):
+        index = zlib.crc32(padded[i : i + 3].encode("utf-8")) % dim
+        vector[index] = vector.get(index, 0.0) + 1.0
+    norm = math.sqrt(sum(v * v for v in vector.values())) or 1.0
+    return {k: v / norm for k, v in vector.items()}
+
+
+def is_negation(token):
+    return token in NEGATION_WORDS or token.endswith("n't")
+
+
+def differs_by_negation(a_tokens, b_tokens):
+    return any(is_negation(token) for token in a_tokens ^ b_tokens)
+
+
+def cosine(a, b):
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(v * b.get(k, 0.0) for k, v in a.items())
+
+
+def context_scope(*parts):
+    return hashlib.sha1("\x1f".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+
+
+class VerdictCache:
+    def __init__(self, max_entries=1024, ttl=600.0, threshold=0.9, max_scan=64):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self.max_scan = max_scan
+        # (scope, fingerprint) -> (created, embedding, tokens, reply)
+        self._entries = OrderedDict()
+        self._scopes = {}  # scope -> OrderedDict of fingerprints (LRU within scope)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.bypasses = 0
+
+    def _drop(self, key):
+        self._entries.pop(key, None)
+        scope, fp = key
+        members = self._scopes.get(scope)
+        if members is not None:
+            members.pop(fp, None)
+            if not members:
+                del self._scopes[scope]
+
+    def get(self, text, scope):
+        """Return a cached reply for this text in this context, or None."""
+        normalized = normalize(text)
+        if not normalized:
+            return None
+        fp = fingerprint(normalized)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get((scope, fp))
+            if entry is not None and now - entry[0] <= self.ttl:
+                self._touch(scope, fp)
+                self.hits += 1
+                return entry[3]
+
+            members = self._scopes.get(scope, {})
+            if members:
+                query = embed(normalized)
+                tokens = frozenset(normalized.split())
+                best, best_fp = self.threshold, None
+                # Most recently used first; bounded so lookups stay cheap.
+                for candidate in list(reversed(members))[: self.max_scan]:
+                    created, vector, candidate_tokens, _ = self._entries[(scope, candidate)]
+                    if now - created > self.ttl:
+                        self._drop((scope, candidate))
+                        continue
+                    if differs_by_negation(tokens, candidate_tokens):
+                        continue
+                    similarity = cosine(query, vector)
+                    if similarity >= best:
+                        best, best_fp = similarity, candidate
+                if best_fp is not None:
+                    self._touch(scope, best_fp)
+                    self.hits += 1
+                    self.near_hits += 1
+                    return self._entries[(scope, best_fp)][3]
+
+            self.misses += 1
+            return None
+
+    def _touch(self, scope, fp):
+        self._entries.move_to_end((scope, fp))
+        self._scopes[scope].move_to_end(fp)
+
+    def put(self, text, scope, reply, risk):
+        """Remember a reply; only Low/Medium verdicts are cacheable."""
+        if str(risk).strip().lower() not in CACHEABLE_RISKS:
+            return False
+        normalized = normalize(text)
+        if not normalized:
+            return False
+        fp = fingerprint(normalized)
+        with self._lock:
+            self._entries[(scope, fp)] = (
+                time.monotonic(),
+                embed(normalized),
+                frozenset(normalized.split()),
+                reply,
+            )
+            self._scopes.setdefault(scope, OrderedDict())[fp] = True
+            self._touch(scope, fp)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+        return True
+
+    def record_bypass(self):
+        with self._lock:
+            self.bypasses += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "near_hits": self.near_hits,
+                "misses": self.misses,
+                "bypasses": self.bypasses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+
+def shared_cache():
+    """Process-wide cache used by GuardianAI sessions by default."""
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = VerdictCache()
+        return _shared_cache